@@ -0,0 +1,109 @@
+"""
+Benchmarks emoji searching, `utils.fuzzy.finder` over every emoji against the emoji index.
+Run with `python -m benchmarks.emoji` from the root of the repo.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from utils.emojis import EmojiIndex
+from utils.fuzzy import finder
+
+EMOJIS = 10_000
+GUILDS = 200
+QUERIES = 500
+VOCABULARY = 1000
+
+
+def make_emojis(rand):
+    vocabulary = [
+        "".join(rand.choices("abcdefghijklmnopqrstuvwxyz", k=rand.randint(2, 7)))
+        for _ in range(VOCABULARY)
+    ]
+    emojis = []
+    for emoji_id in range(EMOJIS):
+        words = rand.sample(vocabulary, rand.randint(1, 3))
+        name = "_".join(words) if rand.random() < 0.5 else "".join(words).title()
+        emojis.append(
+            SimpleNamespace(id=emoji_id, name=name, guild_id=emoji_id % GUILDS)
+        )
+    return emojis
+
+
+def make_queries(rand, emojis):
+    queries = []
+    for _ in range(QUERIES):
+        name = rand.choice(emojis).name
+        kind = rand.random()
+        if kind < 0.4:
+            queries.append(name)
+        elif kind < 0.8:
+            # abbreviations like ";ppl" for pepe_laugh
+            picked = sorted(rand.sample(range(len(name)), min(len(name), 3)))
+            queries.append("".join(name[i] for i in picked))
+        else:
+            queries.append("".join(rand.choices("abcdefghijklmnopqrstuvwxyz", k=4)))
+    return queries
+
+
+def timed(func, queries):
+    start = time.perf_counter()
+    results = [func(query) for query in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    rand = random.Random(0)
+    emojis = make_emojis(rand)
+    queries = make_queries(rand, emojis)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = EmojiIndex()
+    index.rebuild(emojis)
+    built = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    old, expected = timed(
+        lambda query: finder(query, emojis, key=lambda e: e.name, lazy=False),
+        queries,
+    )
+    new, results = timed(index.search, queries)
+    assert results == expected, "the index has to rank exactly like finder"
+    first, results = timed(lambda query: index.search(query, limit=1), queries)
+    assert results == [matches[:1] for matches in expected]
+
+    print(f"{EMOJIS} emojis, {QUERIES} queries")
+    print(f"  index: built in {built * 1000:.0f} ms, {memory / 1024 / 1024:.1f} MiB")
+    print(f" finder: {old * 1000:8.3f} ms/query")
+    print(f"  index: {new * 1000:8.3f} ms/query")
+    print(f"  first: {first * 1000:8.3f} ms/query, index with limit=1")
+
+    for guild_id in range(0, GUILDS, 2):
+        index.remove_guild(guild_id)
+    emojis = [emoji for emoji in emojis if emoji.guild_id % 2]
+    for query in queries:
+        assert index.search(query) == finder(
+            query, emojis, key=lambda e: e.name, lazy=False
+        )
+
+
+if __name__ == "__main__":
+    main()
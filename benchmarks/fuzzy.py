@@ -0,0 +1,96 @@
+"""
+Benchmarks string similarity, the old NumPy edit distance against utils.similarity.
+Run with `python -m benchmarks.fuzzy` from the root of the repo.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import difflib
+import random
+import time
+
+import numpy as np
+
+from utils import similarity
+
+PAIRS = 200
+COMMANDS = 300
+QUERIES = 200
+
+
+def levenshtein_match_calc(s, t):
+    # what Utilities.levenshtein_match_calc used to be, without the executor
+    rows = len(s) + 1
+    cols = len(t) + 1
+    distance = np.zeros((rows, cols), dtype=int)
+
+    for i in range(1, rows):
+        for k in range(1, cols):
+            distance[i][0] = i
+            distance[0][k] = k
+
+    for col in range(1, cols):
+        for row in range(1, rows):
+            cost = 0 if s[row - 1] == t[col - 1] else 2
+            distance[row][col] = min(
+                distance[row - 1][col] + 1,  # Cost of deletions
+                distance[row][col - 1] + 1,  # Cost of insertions
+                distance[row - 1][col - 1] + cost,
+            )  # Cost of substitutions
+    Ratio = ((len(s) + len(t)) - distance[row][col]) / (len(s) + len(t))
+    return int(Ratio * 100)
+
+
+def word(rand, low, high):
+    return "".join(rand.choices("abcdefghijklmnop", k=rand.randint(low, high)))
+
+
+def per_call(func, items):
+    start = time.perf_counter()
+    results = [func(*item) for item in items]
+    return (time.perf_counter() - start) / len(items), results
+
+
+def main():
+    rand = random.Random(0)
+
+    for low, high in ((3, 12), (40, 80)):
+        pairs = [(word(rand, low, high), word(rand, low, high)) for _ in range(PAIRS)]
+        old, expected = per_call(levenshtein_match_calc, pairs)
+        new, results = per_call(lambda a, b: int(similarity.ratio(a, b) * 100), pairs)
+        assert results == expected, "ratio has to agree with the old edit distance"
+        print(f"pairs of {low}-{high} characters")
+        print(f"   numpy: {old * 1e6:9.1f} µs/pair")
+        print(f"   ratio: {new * 1e6:9.1f} µs/pair")
+
+    commands = [word(rand, 3, 10) for _ in range(COMMANDS)]
+    queries = [(word(rand, 3, 10),) for _ in range(QUERIES)]
+    old, _ = per_call(lambda query: difflib.get_close_matches(query, commands), queries)
+    loop, _ = per_call(
+        lambda query: [similarity.ratio(query, command) for command in commands],
+        queries,
+    )
+    new, _ = per_call(
+        lambda query: similarity.extract(query, commands, limit=3, cutoff=0.6),
+        queries,
+    )
+    print(f"one query against {COMMANDS} commands")
+    print(f" difflib: {old * 1e6:9.1f} µs/query (get_close_matches)")
+    print(f"   ratio: {loop * 1e6:9.1f} µs/query (ratio in a loop)")
+    print(f" extract: {new * 1e6:9.1f} µs/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmarks prefix resolution, old `when_mentioned_or` against the compiled matcher.
+Run with `python -m benchmarks.prefix` from the root of the repo.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import collections
+import timeit
+import tracemalloc
+from types import SimpleNamespace
+
+from discord.ext import commands
+
+from utils.prefixes import PrefixMatcher
+
+RUNS = 200_000
+GUILDS = 1000
+
+
+def old_get_prefix(bot, message):
+    # what bot.get_prefix used to do for every message
+    if not message.guild:
+        return commands.when_mentioned_or(bot.default_prefix)(bot, message)
+
+    if bot.prefixes[message.guild.id]:
+        return commands.when_mentioned_or(*bot.prefixes[message.guild.id])(bot, message)
+
+    bot.prefixes[message.guild.id].append(bot.default_prefix)
+    return commands.when_mentioned_or(*bot.prefixes[message.guild.id])(bot, message)
+
+
+def new_get_prefix(bot, message):
+    return bot.prefix_matcher.get(message.guild.id if message.guild else None)
+
+
+def make_bot():
+    bot = SimpleNamespace(
+        user=SimpleNamespace(id=809587169520910346, mention="<@809587169520910346>"),
+        default_prefix="p!",
+        prefixes=collections.defaultdict(list),
+    )
+    for guild_id in range(0, GUILDS, 2):
+        bot.prefixes[guild_id].extend(("p!", "walrus ", "?"))
+    bot.prefix_matcher = PrefixMatcher(bot)
+    return bot
+
+
+def allocated(func, bot, messages) -> int:
+    """Bytes still held after resolving the prefix of every message."""
+    for message in messages:
+        func(bot, message)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [func(bot, message) for message in messages]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return after - before
+
+
+def main():
+    messages = [
+        SimpleNamespace(guild=SimpleNamespace(id=guild_id) if guild_id else None)
+        for guild_id in range(GUILDS)
+    ]
+    message = messages[2]
+
+    for name, func in (
+        ("when_mentioned_or", old_get_prefix),
+        ("compiled", new_get_prefix),
+    ):
+        bot = make_bot()
+        kept = allocated(func, bot, messages)
+        seconds = timeit.timeit(lambda: func(bot, message), number=RUNS)
+        print(
+            f"{name:>18}: {seconds / RUNS * 1e9:5.0f} ns/message, "
+            f"{kept / GUILDS:4.0f} bytes/message, "
+            f"{len(bot.prefixes)} guilds in bot.prefixes"
+        )
+
+    bot = make_bot()
+    for message in messages:
+        new_get_prefix(bot, message)
+    assert new_get_prefix(bot, messages[2]) is new_get_prefix(bot, messages[2])
+    assert len(bot.prefixes) == GUILDS // 2, "the matcher shouldn't add guilds"
+
+
+if __name__ == "__main__":
+    main()
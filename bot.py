@@ -30,10 +30,22 @@ import toml
 from discord.ext import commands
 
 from utils import create_logger
+from utils.cache import SizedLRUCache, TTLCache
 from utils.default import Blacklisted, Maintenance
+from utils.eco import BalanceCache, Ledger
+from utils.emojis import EmojiIndex
+from utils.http import HTTPClient
+from utils.imagecache import ImageCache
+from utils.prefixes import PrefixMatcher
+from utils.workers import ImagePool
 
 logger = create_logger("Walrus")
 
+IMAGE_RESULTS_BUDGET = 32 * 1024 * 1024
+USER_NAME_TTL = 3600
+DELETED_USER_TTL = 86400
+FETCH_USER_CONCURRENCY = 5
+
 try:
     import uvloop
 except ImportError:
@@ -42,16 +54,9 @@ else:
     asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 
-async def get_prefix(bot, message):
+def get_prefix(bot, message):
     """Function for getting the command prefix."""
-    if not message.guild:
-        return commands.when_mentioned_or(bot.default_prefix)(bot, message)
-
-    if bot.prefixes[message.guild.id]:
-        return commands.when_mentioned_or(*bot.prefixes[message.guild.id])(bot, message)
-
-    bot.prefixes[message.guild.id].append(bot.default_prefix)
-    return commands.when_mentioned_or(*bot.prefixes[message.guild.id])(bot, message)
+    return bot.prefix_matcher.get(message.guild.id if message.guild else None)
 
 
 class Walrus(commands.Bot):
@@ -64,7 +69,9 @@ class Walrus(commands.Bot):
         # Base variables for core functionality
         with open("config.toml") as f:
             self.settings = toml.loads(f.read())
+        # only for webhooks, everything else goes through self.web
         self.session = aiohttp.ClientSession()
+        self.web = HTTPClient()
         self.embed_color = 0x89CFF0
 
         self.support_invite = self.settings["misc"]["support_server_invite"]
@@ -73,12 +80,29 @@ class Walrus(commands.Bot):
         # Cache so I don't have to use DB
         self.prefixes = collections.defaultdict(list)
         self.default_prefix = "p!"
+        self.prefix_matcher = PrefixMatcher(self)
         self.command_list = []
         self.afk = {}
         self.highlights = {}
+        self.emoji_index = EmojiIndex()
         self.blacklist = {}
         self.usage_counter = 0
         self.command_usage = collections.Counter()
+        self.message_stats = collections.Counter()
+        self.balances = BalanceCache()
+        self.leaderboards = {}
+        self.user_names = TTLCache(ttl=USER_NAME_TTL, maxsize=10000)
+        self._fetch_user_semaphore = asyncio.Semaphore(FETCH_USER_CONCURRENCY)
+        self.images = ImageCache()
+        self.image_pool = ImagePool()
+        self.image_results = SizedLRUCache(budget=IMAGE_RESULTS_BUDGET)
+        self.caches = {
+            "balances": self.balances,
+            "user names": self.user_names,
+            "images": self.images,
+            "image results": self.image_results,
+        }
+        self.ledger = Ledger(self)
 
         # Webhooks
         self.error_webhook = discord.Webhook.from_url(
@@ -105,6 +129,45 @@ class Walrus(commands.Bot):
             user = await self.fetch_user(user_id)
         return user
 
+    async def resolve_users(self, user_ids) -> dict:
+        """
+        Method to get the names of a lot of users at once.
+        Users that aren't cached are fetched from the API concurrently, deleted accounts are remembered too.
+        """
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            user = self.get_user(user_id)
+            if user:
+                names[user_id] = str(user)
+                continue
+            name = self.user_names.get(user_id)
+            if name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = name
+
+        missing = list(dict.fromkeys(missing))
+        fetched = await asyncio.gather(*map(self._fetch_user_name, missing))
+        names.update(zip(missing, fetched))
+        return names
+
+    async def _fetch_user_name(self, user_id: int) -> str:
+        async with self._fetch_user_semaphore:
+            try:
+                user = await self.fetch_user(user_id)
+            except discord.NotFound:
+                self.user_names.set(user_id, "Deleted User", ttl=DELETED_USER_TTL)
+                return "Deleted User"
+            except discord.HTTPException:
+                return str(user_id)
+        self.user_names[user_id] = str(user)
+        return str(user)
+
+    async def get_prefix(self, message):
+        """Hands back the compiled prefix tuple as is, instead of copying it into a new list."""
+        return self.command_prefix(self, message)
+
     def embed(self, ctx, **kwargs):
         color = kwargs.pop("color", self.embed_color)
         embed = discord.Embed(**kwargs, color=color)
@@ -123,6 +186,7 @@ class Walrus(commands.Bot):
             logger.error("Could not connect to database: %s", e)
         else:
             self.db = pool_pg
+            self.ledger.start()
 
             for file in os.listdir("exts"):
                 if not file.startswith("_") and file.endswith(".py"):
@@ -141,6 +205,7 @@ class Walrus(commands.Bot):
             await self.db.execute(f.read())
 
         self.mention_match = re.compile(fr"^(<@!?{self.user.id}>)\s*")
+        self.emoji_index.rebuild(self.emojis)
 
         for guild in self.guilds:
             await self.db.execute(
@@ -150,11 +215,21 @@ class Walrus(commands.Bot):
 
         for guild in await self.db.fetch("SELECT guild_id, prefix FROM prefixes"):
             self.prefixes[guild["guild_id"]].append(guild["prefix"])
+        self.prefix_matcher.invalidate()
 
         self.blacklist = dict(
             await self.db.fetch("SELECT user_id, reason FROM blacklist")
         )
 
+        for row in await self.db.fetch(
+            "SELECT guild_id, user_id, word FROM highlights"
+        ):
+            words = self.highlights.setdefault(row["guild_id"], {})
+            words.setdefault(row["word"], set()).add(row["user_id"])
+
+        for afk in await self.db.fetch("SELECT user_id, reason, time FROM afk"):
+            self.afk[afk["user_id"]] = {"reason": afk["reason"], "time": afk["time"]}
+
         logger.info("Created cache")
 
     def create_command_list(self):
@@ -178,6 +253,13 @@ class Walrus(commands.Bot):
     async def close(self):
         await self.alex.close()
         await self.session.close()
+        await self.web.close()
+        await self.ledger.close()
+        # cogs are only unloaded after this, too late to write anything
+        facts = self.get_cog("Facts")
+        if facts is not None:
+            await facts.facts.close()
+        self.image_pool.close()
         await self.db.close()
         await super().close()
 
@@ -198,15 +280,28 @@ class Walrus(commands.Bot):
 
     async def on_message(self, message: discord.Message):
         """Checking if someone pings the bot."""
-        perms = (
-            message.channel.permissions_for(message.guild.me).send_messages
-            + message.channel.permissions_for(message.guild.me).embed_links
-            if message.guild
-            else 2
-        )
-        if message.author.bot or not self.is_ready() or perms != 2:
+        # cheapest checks first, most messages aren't commands
+        if message.author.bot:
+            self.message_stats["bot"] += 1
+            return
+        if not self.is_ready():
+            self.message_stats["not ready"] += 1
+            return
+        content = message.content
+        if not (
+            content.startswith(self.prefix_matcher.mentions)
+            or content.startswith(get_prefix(self, message))
+        ):
+            self.message_stats["no prefix"] += 1
             return
-        if self.mention_match.fullmatch(message.content):
+        if message.guild:
+            perms = message.channel.permissions_for(message.guild.me)
+            if not (perms.send_messages and perms.embed_links):
+                self.message_stats["missing permissions"] += 1
+                return
+
+        self.message_stats["processed"] += 1
+        if self.mention_match.fullmatch(content):
             ctx = await self.get_context(message)
             prefix_command = self.get_command("prefix all")
 
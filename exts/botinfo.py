@@ -21,6 +21,7 @@ import platform
 
 import humanize
 import psutil
+import tabulate
 from discord.ext import commands, menus
 
 from exts.useful import TodoPages
@@ -195,6 +196,26 @@ class BotInfo(commands.Cog):
 
         await msg.edit(content=None, embed=emb)
 
+    @commands.command(aliases=["caches"])
+    async def cachestats(self, ctx):
+        """Returns how often the bot's caches saved a lookup."""
+        rows = []
+        for name, cache in self.bot.caches.items():
+            total = cache.hits + cache.misses
+            rows.append(
+                {
+                    "cache": name,
+                    "size": len(cache),
+                    "hits": cache.hits,
+                    "misses": cache.misses,
+                    "hit rate": f"{cache.hits / total:.0%}" if total else "-",
+                }
+            )
+        table = tabulate.tabulate(rows, headers="keys", tablefmt="github")
+        await ctx.send(
+            embed=ctx.embed(title="Cache Stats", description=f"```py\n{table}```")
+        )
+
     @commands.command()
     async def vote(self, ctx):
         await ctx.send(
@@ -6,7 +6,7 @@ import humanize
 from discord.ext import commands
 
 from utils.blackjack import Deck, Gamble, Hand
-from utils.eco import get_number, get_stats
+from utils.eco import cache_balance, get_number, get_stats
 
 
 class Blackjack:
@@ -175,13 +175,7 @@ class Blackjack:
 
         await self.show_all()
 
-        query = """
-            UPDATE economy SET cash = cash + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-        await self.ctx.bot.db.execute(
-            query, self.bet.total, self.ctx.guild.id, self.ctx.author.id
-        )
+        self.ctx.bot.ledger.add(self.ctx.guild.id, self.ctx.author.id, self.bet.total)
 
 
 class Casino(commands.Cog):
@@ -198,10 +192,12 @@ class Casino(commands.Cog):
         cash, _ = await get_stats(ctx, ctx.author.id)
         amount = get_number(bet, cash)
         query = """
-            UPDATE economy SET cash = cash - $1
+            UPDATE economy SET cash = cash - $1, version = version + 1
             WHERE guild_id = $2 AND user_id = $3
+            RETURNING cash, bank, version
             """
-        await self.bot.db.execute(query, amount, ctx.guild.id, ctx.author.id)
+        row = await self.bot.db.fetchrow(query, amount, ctx.guild.id, ctx.author.id)
+        cache_balance(self.bot, ctx.guild.id, ctx.author.id, row)
 
         bj = Blackjack(ctx, amount)
         await bj.start()
@@ -224,11 +220,7 @@ class Casino(commands.Cog):
             total = -amount
             result = f"😥 No match. **${total}**"
 
-        query = """
-            UPDATE economy SET cash = cash + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-        await self.bot.db.execute(query, total, ctx.guild.id, ctx.author.id)
+        self.bot.ledger.add(ctx.guild.id, ctx.author.id, total)
         await ctx.send(embed=ctx.embed(description=f"{' '.join(e)}\n\n{result}"))
 
 
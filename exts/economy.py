@@ -23,10 +23,72 @@ import typing
 import discord
 import humanize
 from asyncpg import UniqueViolationError
-from discord.ext import commands
+from discord.ext import commands, menus
 
+from exts.useful import TodoPages
 from utils.argparse import Arguments
-from utils.eco import get_number, get_stats
+from utils.eco import (
+    InsufficientFunds,
+    cache_balance,
+    get_leaderboard,
+    get_number,
+    get_stats,
+    move,
+)
+
+
+class LeaderboardSource(menus.PageSource):
+    """
+    Pages through a Leaderboard by key instead of by offset.
+    Flipping to the next page continues after the last entry shown, even if people moved around in between.
+    """
+
+    def __init__(self, board, order: str, per_page: int = 10):
+        self.board = board
+        self.order = order
+        self.per_page = per_page
+        self.cursors = {}
+
+    def is_paginating(self):
+        return self.get_max_pages() > 1
+
+    def get_max_pages(self):
+        return max(math.ceil(self.board.count(self.order) / self.per_page), 1)
+
+    async def get_page(self, page_number):
+        after = self.cursors.get(page_number - 1)
+        if after is None and page_number:
+            after = self.board.key_at(self.order, page_number * self.per_page - 1)
+
+        entries = self.board.page(self.order, after, self.per_page)
+        if entries:
+            _, user_id, value = entries[-1]
+            self.cursors[page_number] = (-value, user_id)
+        return entries
+
+    async def format_page(self, menu, entries):
+        ctx = menu.ctx
+        names = await ctx.bot.resolve_users(user_id for _, user_id, _ in entries)
+        lb = []
+        for number, user_id, total in entries:
+            # Need to escape markdown
+            name = discord.utils.escape_markdown(names[user_id])
+            # Add a rickroll cuz I'm lazy and the formatting makes it look nice
+            with_link = f" [{name}](https://www.youtube.com/watch?v=dQw4w9WgXcQ, 'seriously, don't click.') "
+            item = f"**{number}.**{with_link}» **${humanize.intcomma(total)}**"
+            lb.append(item)
+        lb.append(f"\nPage {menu.current_page + 1}/{self.get_max_pages()}")
+
+        return ctx.embed(
+            title=f"{ctx.guild.name} Leaderboard", description="\n".join(lb)
+        )
+
+
+class LeaderboardPages(TodoPages):
+    async def send_initial_message(self, ctx, channel):
+        page = await self._source.get_page(self.current_page)
+        kwargs = await self._get_kwargs_from_page(page)
+        return await channel.send(**kwargs)
 
 
 class Economy(commands.Cog):
@@ -53,11 +115,13 @@ class Economy(commands.Cog):
     async def register(self, ctx):
         query = """
             INSERT INTO economy VALUES ($1, $2)
+            RETURNING cash, bank, version
             """
         try:
-            await self.bot.db.execute(query, ctx.guild.id, ctx.author.id)
+            row = await self.bot.db.fetchrow(query, ctx.guild.id, ctx.author.id)
         except UniqueViolationError:
             return await ctx.send("You are already registered!")
+        cache_balance(self.bot, ctx.guild.id, ctx.author.id, row)
         await ctx.send("Registered you into the database.")
 
     @commands.command()
@@ -70,7 +134,10 @@ class Economy(commands.Cog):
             query = """
                 DELETE FROM economy WHERE guild_id = $1 AND user_id = $2
                 """
+            await self.bot.ledger.wait()
             await self.bot.db.execute(query, ctx.guild.id, ctx.author.id)
+            self.bot.ledger.discard(ctx.guild.id, ctx.author.id)
+            cache_balance(self.bot, ctx.guild.id, ctx.author.id, None)
             return await message.edit(
                 content="Successfully unregistered you on this server."
             )
@@ -111,14 +178,7 @@ class Economy(commands.Cog):
         Arguments:
             `page`: [Optional] The leaderboard page you would like to see. If not provided, it will send the first page.
         """
-        lb_query = """
-            SELECT ROW_NUMBER() OVER (ORDER BY cash + bank DESC) AS number, user_id, cash + bank AS total
-            FROM economy WHERE guild_id = $1 ORDER BY cash + bank DESC OFFSET $2 LIMIT 10
-            """
-        count_query = """
-            SELECT COUNT(user_id) FROM economy
-            WHERE guild_id = $1
-            """
+        order = "total"
         if item:
             parser = Arguments(allow_abbrev=False, add_help=False)
             parser.add_argument("-cash", "--cash", action="store_true", default=False)
@@ -130,49 +190,16 @@ class Economy(commands.Cog):
                 return await ctx.send(embed=ctx.embed(description=str(e)))
 
             if args.cash:
-                lb_query = """
-                    SELECT ROW_NUMBER() OVER (ORDER BY cash DESC) AS number, user_id, cash AS total
-                    FROM economy WHERE guild_id = $1 ORDER BY cash DESC OFFSET $2 LIMIT 10
-                    """
-                count_query = """
-                    SELECT COUNT(user_id) FROM economy
-                    WHERE guild_id = $1 AND cash > 0
-                    """
+                order = "cash"
             if args.bank:
-                lb_query = """
-                    SELECT ROW_NUMBER() OVER (ORDER BY bank DESC) AS number, user_id, bank AS total
-                    FROM economy WHERE guild_id = $1 ORDER BY bank DESC OFFSET $2 LIMIT 10
-                    """
-                count_query = """
-                    SELECT COUNT(user_id) FROM economy
-                    WHERE guild_id = $1 AND bank > 0
-                    """
-
-        async with self.bot.db.acquire() as conn:
-            async with conn.transaction():
-                count = await conn.fetchval(count_query, ctx.guild.id)
-                # need to check if the page is more than the amount allowed
-                max_pages = math.ceil(count / 10)
-                page = min(page, max_pages)
-
-                data = await conn.fetch(lb_query, ctx.guild.id, (page * 10) - 10)
-
-        lb = []
-        for user in data:
-            # Need to escape markdown
-            name = discord.utils.escape_markdown(
-                str(await self.bot.try_user(user["user_id"]))
-            )
-            # Add a rickroll cuz I'm lazy and the formatting makes it look nice
-            with_link = f" [{name}](https://www.youtube.com/watch?v=dQw4w9WgXcQ, 'seriously, don't click.') "
-            item = f"**{user['number']}.**{with_link}» **${humanize.intcomma(user['total'])}**"
-            lb.append(item)
-        lb.append(f"\nPage {page}/{max_pages}")
+                order = "bank"
 
-        embed = ctx.embed(
-            title=f"{ctx.guild.name} Leaderboard", description="\n".join(lb)
-        )
-        await ctx.send(embed=embed)
+        board = await get_leaderboard(self.bot, ctx.guild.id, order)
+        source = LeaderboardSource(board, order)
+        pages = LeaderboardPages(source=source)
+        # need to check if the page is more than the amount allowed
+        pages.current_page = max(min(page, source.get_max_pages()), 1) - 1
+        await pages.start(ctx)
 
     @commands.command(help="Deposits a set amount into your bank", aliases=["dep"])
     async def deposit(self, ctx, amount: str):
@@ -183,12 +210,9 @@ class Economy(commands.Cog):
         if amount == 0:
             return await ctx.send(embed=ctx.embed(description="You have no cash."))
 
-        query = """
-            UPDATE economy SET cash = cash - $1, bank = bank + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-
-        await self.bot.db.execute(query, amount, ctx.guild.id, ctx.author.id)
+        await move(
+            self.bot, ctx.guild.id, ctx.author.id, ctx.author.id, amount, "cash", "bank"
+        )
 
         await ctx.send(
             embed=ctx.embed(
@@ -206,12 +230,9 @@ class Economy(commands.Cog):
         if amount == 0:
             return await ctx.send(embed=ctx.embed(description="You have no cash."))
 
-        query = """
-            UPDATE economy SET cash = cash + $1, bank = bank - $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-
-        await self.bot.db.execute(query, amount, ctx.guild.id, ctx.author.id)
+        await move(
+            self.bot, ctx.guild.id, ctx.author.id, ctx.author.id, amount, "bank", "cash"
+        )
         await ctx.send(
             embed=ctx.embed(
                 description=f"You withdrew **${humanize.intcomma(amount)}** from your bank."
@@ -227,20 +248,7 @@ class Economy(commands.Cog):
 
         amount = get_number(amount, author_cash)
 
-        async with self.bot.db.acquire() as conn:
-            async with conn.transaction():
-                await self.bot.db.execute(
-                    "UPDATE economy SET cash = cash - $1 WHERE guild_id = $2 AND user_id = $3",
-                    amount,
-                    ctx.guild.id,
-                    ctx.author.id,
-                )
-                await self.bot.db.execute(
-                    "UPDATE economy SET cash = cash + $1 WHERE guild_id = $2 AND user_id = $3",
-                    amount,
-                    ctx.guild.id,
-                    user.id,
-                )
+        await move(self.bot, ctx.guild.id, ctx.author.id, user.id, amount)
 
         await ctx.send(
             embed=ctx.embed(
@@ -257,9 +265,10 @@ class Economy(commands.Cog):
             desc = f"You try to rob {user.mention}, but the police see you and let you go with a warning."
             return await ctx.send(embed=ctx.embed(description=desc))
 
+        await get_stats(ctx, ctx.author.id)
         target_cash, _ = await get_stats(ctx, user.id, True)
 
-        if target_cash == 0:
+        if target_cash <= 0:
             return await ctx.send(
                 embed=ctx.embed(
                     description="That user has no cash. Shame on you for trying to rob them."
@@ -268,19 +277,14 @@ class Economy(commands.Cog):
 
         amount = random.randint(1, target_cash)
 
-        async with self.bot.db.acquire() as conn:
-            async with conn.transaction():
-                author_query = """
-                    UPDATE economy SET cash = cash + $1
-                    WHERE guild_id = $2 AND user_id = $3
-                    """
-                target_query = """
-                    UPDATE economy SET cash = cash - $1
-                    WHERE guild_id = $2 AND user_id = $3
-                    """
-
-                await conn.execute(target_query, amount, ctx.guild.id, user.id)
-                await conn.execute(author_query, amount, ctx.guild.id, ctx.author.id)
+        try:
+            await move(self.bot, ctx.guild.id, user.id, ctx.author.id, amount)
+        except InsufficientFunds:
+            return await ctx.send(
+                embed=ctx.embed(
+                    description=f"{user.mention} spent their cash before you could grab it."
+                )
+            )
 
         await ctx.send(
             embed=ctx.embed(
@@ -332,13 +336,7 @@ class Economy(commands.Cog):
                 return await ctx.send(embed=embed)
 
         cash = random.randint(100, 500)
-
-        query = """
-            UPDATE economy SET cash = cash + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-
-        await self.bot.db.execute(query, cash, ctx.guild.id, ctx.author.id)
+        self.bot.ledger.add(ctx.guild.id, ctx.author.id, cash)
 
         embed.description = f"I transfered **${cash}** to you."
         await m.edit(embed=embed)
@@ -347,13 +345,7 @@ class Economy(commands.Cog):
     @commands.cooldown(rate=1, per=86400, type=commands.BucketType.user)
     async def daily(self, ctx):
         cash = random.randint(500, 1000)
-
-        query = """
-            UPDATE economy SET cash = cash + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-
-        await self.bot.db.execute(query, cash, ctx.guild.id, ctx.author.id)
+        self.bot.ledger.add(ctx.guild.id, ctx.author.id, cash)
 
         await ctx.send(
             embed=ctx.embed(
@@ -406,13 +398,7 @@ class Economy(commands.Cog):
         price = random.randint(20, 35)
         fish = random.randint(5, 20)
         cash = price * fish
-
-        query = """
-            UPDATE economy SET cash = cash + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-
-        await self.bot.db.execute(query, cash, ctx.guild.id, ctx.author.id)
+        self.bot.ledger.add(ctx.guild.id, ctx.author.id, cash)
 
         embed.description = f"You travel to the local lake and catch **{fish}** fish {correct_fish}.\nThen you sell them to the market at a price of **${price}**, totaling in at **${cash}** for a days work."
 
@@ -429,17 +415,12 @@ class Economy(commands.Cog):
             return await ctx.send(
                 "You sit all day on the street, but collect no money."
             )
-        async with self.bot.session.get("https://pipl.ir/v1/getPerson") as f:
+        async with self.bot.web.get("https://pipl.ir/v1/getPerson") as f:
             cities = await f.json()
 
         cash = random.randint(0, 500)
+        self.bot.ledger.add(ctx.guild.id, ctx.author.id, cash)
 
-        query = """
-            UPDATE economy SET cash = cash + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-
-        await self.bot.db.execute(query, cash, ctx.guild.id, ctx.author.id)
         city = cities["person"]["personal"]["city"]
         msg = f'You sit on the streets of {city} and a nice {random.choice(["man", "woman"])} hands you ${cash}.'
         await ctx.send(embed=ctx.embed(description=msg))
@@ -471,12 +452,14 @@ class Economy(commands.Cog):
             )
 
         query = """
-            UPDATE economy SET cash = cash - $1
+            UPDATE economy SET cash = cash - $1, version = version + 1
             WHERE guild_id = $2 AND user_id = $3
+            RETURNING cash, bank, version
             """
 
         self.bot.get_command(command).reset_cooldown(ctx)
-        await self.bot.db.execute(query, 400, ctx.guild.id, ctx.author.id)
+        row = await self.bot.db.fetchrow(query, 400, ctx.guild.id, ctx.author.id)
+        cache_balance(self.bot, ctx.guild.id, ctx.author.id, row)
         await ctx.send(
             embed=ctx.embed(
                 description=f"Reset the command cooldown for the command `{command}` and subtracted **$400** from your account."
@@ -588,11 +571,7 @@ class Economy(commands.Cog):
                     )
                 break
 
-        query = """
-            UPDATE economy SET cash = cash + $1
-            WHERE guild_id = $2 AND user_id = $3
-            """
-        await self.bot.db.execute(query, amount, ctx.guild.id, ctx.author.id)
+        self.bot.ledger.add(ctx.guild.id, ctx.author.id, amount)
 
         await ctx.send(f"💰 You make off with a total of **${amount}** in your bag.")
 
@@ -629,10 +608,15 @@ class Economy(commands.Cog):
             raise commands.BadArgument("Amount must be a number.")
         amount = int(amount)
         query = """
-            UPDATE economy SET cash = $1
+            UPDATE economy SET cash = $1, version = version + 1
             WHERE guild_id = $2 AND user_id = $3
+            RETURNING cash, bank, version
             """
-        await self.bot.db.execute(query, amount, ctx.guild.id, user.id)
+        # pending payouts would land on top of the new value
+        await self.bot.ledger.wait()
+        self.bot.ledger.discard(ctx.guild.id, user.id)
+        row = await self.bot.db.fetchrow(query, amount, ctx.guild.id, user.id)
+        cache_balance(self.bot, ctx.guild.id, user.id, row)
         await ctx.send(f"Set {user.name}'s cash to **{amount}**")
 
     @_set.command()
@@ -642,10 +626,12 @@ class Economy(commands.Cog):
             raise commands.BadArgument("Amount must be a number.")
         amount = int(amount)
         query = """
-            UPDATE economy SET bank = $1
+            UPDATE economy SET bank = $1, version = version + 1
             WHERE guild_id = $2 AND user_id = $3
+            RETURNING cash, bank, version
             """
-        await self.bot.db.execute(query, amount, ctx.guild.id, user.id)
+        row = await self.bot.db.fetchrow(query, amount, ctx.guild.id, user.id)
+        cache_balance(self.bot, ctx.guild.id, user.id, row)
         await ctx.send(f"Set {user.name}'s bank to **{amount}**")
 
 
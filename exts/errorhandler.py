@@ -7,6 +7,8 @@ import prettify_exceptions
 from discord.ext import commands
 
 from utils.eco import NotRegistered
+from utils.http import CircuitOpen
+from utils.workers import ImageBusy
 
 
 class CommandErrorHandler(commands.Cog):
@@ -124,6 +126,9 @@ class CommandErrorHandler(commands.Cog):
         if isinstance(error, commands.BadArgument):
             return await ctx.send(embed=ctx.embed(title=str(error)))
 
+        if isinstance(error, (ImageBusy, CircuitOpen)):
+            return await ctx.send(embed=ctx.embed(description=str(error)))
+
         if isinstance(error, asyncio.TimeoutError):
             return await ctx.send(embed=ctx.embed(description=f"{command} timed out."))
 
@@ -42,7 +42,11 @@ class Events(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
         await self.bot.db.execute("DELETE FROM guilds WHERE guild_id = $1", guild.id)
-        del self.bot.prefixes[guild.id]
+        self.bot.prefixes.pop(guild.id, None)
+        self.bot.prefix_matcher.invalidate(guild.id)
+        self.bot.emoji_index.remove_guild(guild.id)
+        self.bot.balances.forget_guild(guild.id)
+        self.bot.leaderboards.pop(guild.id, None)
 
         stats = (
             f"Name: {guild.name}\n"
@@ -62,6 +66,8 @@ class Events(commands.Cog):
             "INSERT INTO prefixes VALUES($1,$2)", guild.id, self.bot.default_prefix
         )
         self.bot.prefixes[guild.id].append(self.bot.default_prefix)
+        self.bot.prefix_matcher.invalidate(guild.id)
+        self.bot.emoji_index.add_guild(guild)
 
         stats = (
             f"Name: {guild.name}\n"
@@ -74,6 +80,10 @@ class Events(commands.Cog):
         message = "I joined a new server:\n" f"```yaml\n{stats}```"
         await self.bot.guild_webhook.send(message)
 
+    @commands.Cog.listener()
+    async def on_guild_emojis_update(self, guild, before, after):
+        self.bot.emoji_index.update_guild(guild)
+
     @tasks.loop(minutes=5)
     async def change_presence(self):
         await self.bot.wait_until_ready()
@@ -106,7 +116,7 @@ class Events(commands.Cog):
             headers = {"Authorization": self.bot.settings["keys"]["top_gg"]}
 
             url = "https://top.gg/api/bots/810570659968057384/stats"
-            await self.bot.session.post(url=url, headers=headers, data=payload)
+            await self.bot.web.post(url=url, headers=headers, data=payload)
             logger.info("Posted stats to top.gg")
         except Exception as err:
             print(err)
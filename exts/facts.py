@@ -14,9 +14,12 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-import json
-from discord.ext import commands, tasks
-import logging
+
+import asyncio
+
+from discord.ext import commands
+
+from utils.facts import JSONFacts, PostgresFacts
 
 ERROR_MESSAGE = "Sorry, it looks like something went wrong here."
 
@@ -24,24 +27,17 @@ ERROR_MESSAGE = "Sorry, it looks like something went wrong here."
 class Facts(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        with open("assets/facts.json") as facts:
-            self.cached_facts = json.loads(facts.read())
-
-        self.insert.start()
+        if bot.settings["misc"].get("fact_store") == "postgres":
+            self.facts = PostgresFacts(bot.db)
+        else:
+            self.facts = JSONFacts()
 
-    @tasks.loop(seconds=20)
-    async def insert(self):
-        cache = self.cached_facts
-        with open("assets/facts.json") as facts:
-            if cache == json.loads(facts.read()):
-                return
-        with open("assets/facts.json", "w") as f:
-            json.dump(cache, f, indent=4)
+    def cog_unload(self):
+        # for reloads, on shutdown the bot closes the store itself
+        asyncio.ensure_future(self.facts.close())
 
     async def animal_fact(self, ctx, animal):
-        async with self.bot.session.get(
-            f"https://some-random-api.ml/facts/{animal}"
-        ) as f:
+        async with self.bot.web.get(f"https://some-random-api.ml/facts/{animal}") as f:
             if not f.ok:
                 return await ctx.send(f"Error code {f.status}. Text: {await f.read()}")
             data = await f.json()
@@ -49,9 +45,8 @@ class Facts(commands.Cog):
         embed = ctx.embed(title="Did you know...", description=fact)
         await ctx.send(embed=embed)
 
-        cached_facts = self.cached_facts[f"{animal}_facts"]
-        if fact not in cached_facts and fact != ERROR_MESSAGE:
-            cached_facts.append(fact)
+        if fact != ERROR_MESSAGE:
+            await self.facts.add(animal, fact)
 
     @commands.command(aliases=["dogfact"])
     async def dog_fact(self, ctx):
@@ -22,19 +22,17 @@ import os
 import random
 import re
 import string
-import textwrap
 import time
 import typing
 from io import BytesIO
 
 import discord
-from PIL import Image, ImageDraw, ImageFont
 from bs4 import BeautifulSoup
 from discord.ext import commands
 from discord.ext.commands.cooldowns import BucketType
-from jishaku.functools import executor_function
 
 from exts.polaroid_manipulation import get_image_url
+from utils import assets, render
 from utils.bottom import from_bottom, to_bottom
 
 mystbin_url = re.compile(
@@ -104,6 +102,8 @@ class Fun(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        # before the image workers fork, so they start with everything loaded
+        assets.preload()
 
     @commands.group()
     async def morse(self, ctx):
@@ -165,7 +165,7 @@ class Fun(commands.Cog):
         help="Sends a cat for every error code", aliases=["httpcat", "http_cat"]
     )
     async def http(self, ctx, code=404):
-        async with self.bot.session.get(f"https://http.cat/{code}") as resp:
+        async with self.bot.web.get(f"https://http.cat/{code}") as resp:
             buffer = await resp.read()
         embed = ctx.embed()
         embed.set_image(url=f"attachment://{code}.png")
@@ -220,7 +220,7 @@ class Fun(commands.Cog):
     @commands.command(name="chucknorris", aliases=["norris", "chucknorrisjoke"])
     async def norris(self, ctx):
         """Tells a random Chuck Norris joke."""
-        data = await self.bot.session.get("https://api.chucknorris.io/jokes/random")
+        data = await self.bot.web.get("https://api.chucknorris.io/jokes/random")
         joke = await data.json()
         e = ctx.embed(
             title="Chuck Norris Joke", url=joke["url"], description=joke["value"]
@@ -237,7 +237,7 @@ class Fun(commands.Cog):
     async def check_mystbin(self, text):
         if match := mystbin_url.match(text):
             paste_id = match.group("ID")
-            async with self.bot.session.get(
+            async with self.bot.web.get(
                 f"https://mystb.in/api/pastes/{paste_id}"
             ) as resp:
                 if resp.status != 200:
@@ -412,19 +412,6 @@ class Fun(commands.Cog):
             pp = f"Output was too long so I put it here => {await ctx.mystbin(pp)}"
         await ctx.send(pp)
 
-    @executor_function
-    def do_typerace(self, text):
-        img = Image.open("assets/black.jpeg")
-        draw = ImageDraw.Draw(img)
-        font = ImageFont.truetype("assets/Montserrat-Regular.ttf", 125)
-        wrapped = textwrap.wrap(text, width=24)
-        w, h = draw.textsize(text)
-        draw.text((40, 40), "\n".join(wrapped), (255, 255, 255), font=font)
-        byte = BytesIO()
-        img.save(byte, "PNG")
-        byte.seek(0)
-        return byte
-
     @commands.max_concurrency(1, per=BucketType.channel, wait=False)
     @commands.cooldown(1, 30, BucketType.user)
     @commands.command(aliases=["tr"])
@@ -436,17 +423,16 @@ class Fun(commands.Cog):
 
         Arguments:
             This command takes no arguments."""
-        async with self.bot.session.get("https://api.quotable.io/random") as f:
+        async with self.bot.web.get("https://api.quotable.io/random") as f:
             data = await f.json()
         text = data["content"]
 
+        image = await self.bot.image_pool.render(ctx, render.typerace, text)
+        name = f"typeracer.{image.format}"
         embed = ctx.embed(title="You have 60 seconds to type this:")
-        embed.set_image(url="attachment://typeracer.png")
+        embed.set_image(url=f"attachment://{name}")
 
-        msg = await ctx.send(
-            embed=embed,
-            file=discord.File(await self.do_typerace(text), "typeracer.png"),
-        )
+        msg = await ctx.send(embed=embed, file=discord.File(BytesIO(image.data), name))
         start = time.perf_counter()
 
         try:
@@ -470,26 +456,6 @@ class Fun(commands.Cog):
                 "There is already an ongoing session of typeracer in this channel."
             )
 
-    @executor_function
-    def do_ahb(self, text):
-        img = Image.open("assets/ahb.jpeg")
-
-        draw = ImageDraw.Draw(img)
-        font = ImageFont.truetype("assets/Helvetica Bold.ttf", 17)
-
-        wrapped = textwrap.wrap(text, width=20)
-
-        down = 90
-        for text in wrapped:
-            width, height = draw.textsize(text, font=font)
-            draw.text(((img.width - width) / 2, down), text, font=font)
-            down += height + 10
-
-        byte = BytesIO()
-        img.save(byte, "PNG")
-        byte.seek(0)
-        return byte
-
     @commands.cooldown(1, 10, BucketType.user)
     @commands.command(aliases=["alwayshasbeen", "ahb"], usage="[text]")
     async def always_has_been(self, ctx, *, text="Wait, it's all Ohio?"):
@@ -500,11 +466,10 @@ class Fun(commands.Cog):
             `text`: [Optional] The text to put on the image."""
         if len(text) > 100:
             return await ctx.send("Sorry, please keep the text under 100 characters.")
-        embed = ctx.embed().set_image(url="attachment://always_has_been.jpeg")
-        await ctx.send(
-            embed=embed,
-            file=discord.File(await self.do_ahb(text), "always_has_been.jpeg"),
-        )
+        image = await self.bot.image_pool.render(ctx, render.always_has_been, text)
+        name = f"always_has_been.{image.format}"
+        embed = ctx.embed().set_image(url=f"attachment://{name}")
+        await ctx.send(embed=embed, file=discord.File(BytesIO(image.data), name))
 
     @commands.command()
     async def sadcat(self, ctx):
@@ -576,7 +541,7 @@ class Fun(commands.Cog):
         }
         headers = {"Content-Type": "application/json; charset=utf-8"}
         caption_url = "https://captionbot.azurewebsites.net/api/messages"
-        async with self.bot.session.post(
+        async with self.bot.web.post(
             caption_url, data=json.dumps(data), headers=headers
         ) as resp:
             caption = await resp.text()
@@ -617,7 +582,7 @@ class Fun(commands.Cog):
 
         Arguments:
             This command takes no arguments."""
-        async with self.bot.session.get("https://some-random-api.ml/animu/quote") as f:
+        async with self.bot.web.get("https://some-random-api.ml/animu/quote") as f:
             data = await f.json()
         embed = ctx.embed(
             title=f'{data.get("characther")} said in{data.get("anime")}',
@@ -631,7 +596,7 @@ class Fun(commands.Cog):
 
         Arguments:
             This command takes no arguments."""
-        async with self.bot.session.get("https://www.tronalddump.io/random/quote") as f:
+        async with self.bot.web.get("https://www.tronalddump.io/random/quote") as f:
             data = await f.json()
         link = data["_links"]["self"]["href"]
         embed = ctx.embed(
@@ -647,7 +612,7 @@ class Fun(commands.Cog):
         Arguments:
             This command takes no arguments."""
         headers = {"Accept": "application/json"}
-        async with self.bot.session.get(
+        async with self.bot.web.get(
             "https://icanhazdadjoke.com/", headers=headers
         ) as f:
             dad = await f.json()
@@ -710,7 +675,7 @@ class Fun(commands.Cog):
         Arguments:
             This command takes no arguments."""
         url = "https://whyarentyoucoding.com"
-        async with self.bot.session.get(url) as f:
+        async with self.bot.web.get(url) as f:
             data = await f.text()
         soup = BeautifulSoup(data, "lxml")
         img = url + soup.find_all("img")[1]["src"]
@@ -790,7 +755,7 @@ class Fun(commands.Cog):
 
         params = {"filter[text]": search}
 
-        async with self.bot.session.get(
+        async with self.bot.web.get(
             "https://kitsu.io/api/edge" + "/anime", params=params
         ) as f:
             if f.status != 200:
@@ -18,10 +18,9 @@ import discord
 
 """komodo stop stealing"""
 
-import difflib
-
 from discord.ext import commands, menus
 import utils
+from utils import similarity
 
 
 def get_sig(ctx, command):
@@ -276,10 +275,12 @@ class HelpCommand(commands.MinimalHelpCommand):
 
     # from pb https://github.com/PB4162/PB-Bot/blob/master/cogs/Help.py#L11-L102
     async def command_not_found(self, string: str):
-        matches = difflib.get_close_matches(string, self.context.bot.command_list)
+        matches = similarity.extract(
+            string, self.context.bot.command_list, limit=1, cutoff=0.6
+        )
         if not matches:
             return f"No command called `{string}` found."
-        match = "\n".join(matches[:1])
+        match = matches[0][0]
         return f"No command called `{string}` found. Did you mean `{match}`?"
 
 
@@ -0,0 +1,241 @@
+"""
+Highlights, DMs you when a word you care about is said in a server.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import collections
+import contextlib
+
+import discord
+from discord.ext import commands, tasks
+
+MAX_WORDS = 20
+MAX_WORD_LENGTH = 50
+FLUSH_INTERVAL = 15
+MAX_PER_DM = 10
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class WordMatcher:
+    """
+    An Aho-Corasick automaton over every highlighted word in a guild.
+    One pass over a message finds every word in it, overlapping ones included,
+    so `python`, `bot` and `python bot` are all found in "my python bot".
+    """
+
+    def __init__(self, words):
+        self.goto = [{}]
+        self.output = [()]
+        for word in words:
+            state = 0
+            for char in word:
+                following = self.goto[state].get(char)
+                if following is None:
+                    following = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.output.append(())
+                state = following
+            self.output[state] += (word,)
+
+        # breadth first, so the state a failure falls back to is always done already
+        self.fail = [0] * len(self.goto)
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                fallback = self.goto[fallback].get(char, 0)
+                self.fail[following] = fallback
+                self.output[following] += self.output[fallback]
+
+    def find(self, text: str) -> list:
+        """Every word that appears in `text` on its own, not inside a longer word, in the order they appear."""
+        text = text.lower()
+        found = {}
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for word in self.output[state]:
+                start = end - len(word)
+                if (start == 0 or not _is_word(text[start - 1])) and (
+                    end == len(text) or not _is_word(text[end])
+                ):
+                    found[word] = None
+        return list(found)
+
+
+class Highlights(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.matchers = {}
+        self.pending = collections.defaultdict(list)
+        self.send_highlights.start()
+
+    def cog_unload(self):
+        self.send_highlights.cancel()
+
+    def get_matcher(self, guild_id: int):
+        """The matcher of a guild, built the first time it's needed after its words changed."""
+        matcher = self.matchers.get(guild_id)
+        if matcher is None:
+            words = self.bot.highlights.get(guild_id)
+            if not words:
+                return None
+            matcher = self.matchers[guild_id] = WordMatcher(words)
+        return matcher
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.author.bot or not message.guild:
+            return
+        words = self.bot.highlights.get(message.guild.id)
+        if not words:
+            return
+
+        notified = set()
+        for word in self.get_matcher(message.guild.id).find(message.content):
+            for user_id in words.get(word, ()):
+                if user_id == message.author.id or user_id in notified:
+                    continue
+                member = message.guild.get_member(user_id)
+                if member is None or member in message.mentions:
+                    continue
+                if not message.channel.permissions_for(member).read_messages:
+                    continue
+                notified.add(user_id)
+                self.pending[user_id].append((word, message))
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.bot.highlights.pop(guild.id, None)
+        self.matchers.pop(guild.id, None)
+
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def send_highlights(self):
+        """Sends everything that got highlighted since the last run, one DM per user."""
+        await self.bot.wait_until_ready()
+        pending, self.pending = self.pending, collections.defaultdict(list)
+        for user_id, highlights in pending.items():
+            user = self.bot.get_user(user_id)
+            if user is None:
+                continue
+            lines = [
+                f"**{word}** in {message.channel.mention} by {message.author}: "
+                f"[jump]({message.jump_url})\n> {message.content[:200]}"
+                for word, message in highlights[:MAX_PER_DM]
+            ]
+            if len(highlights) > MAX_PER_DM:
+                lines.append(f"... and {len(highlights) - MAX_PER_DM} more.")
+            embed = discord.Embed(
+                title="You were highlighted",
+                description="\n\n".join(lines)[:2048],
+                color=self.bot.embed_color,
+            )
+            with contextlib.suppress(discord.Forbidden, discord.HTTPException):
+                await user.send(embed=embed)
+
+    def get_words(self, guild_id: int, user_id: int) -> list:
+        words = self.bot.highlights.get(guild_id, {})
+        return sorted(word for word, users in words.items() if user_id in users)
+
+    @commands.group(aliases=["hl"])
+    @commands.guild_only()
+    async def highlight(self, ctx):
+        """
+        Get a DM when someone says a word you care about in this server.
+        Highlights are bundled, so you get at most one DM every few seconds.
+        """
+        if ctx.invoked_subcommand is None:
+            await ctx.send_help(str(ctx.command))
+
+    @highlight.command(name="add")
+    async def highlight_add(self, ctx, *, word: str):
+        """Adds a word to your highlights in this server."""
+        word = word.lower().strip()
+        if not word or len(word) > MAX_WORD_LENGTH:
+            raise commands.BadArgument(
+                f"Highlights have to be between 1 and {MAX_WORD_LENGTH} characters."
+            )
+        current = self.get_words(ctx.guild.id, ctx.author.id)
+        if word in current:
+            raise commands.BadArgument("This is already one of your highlights.")
+        if len(current) >= MAX_WORDS:
+            raise commands.BadArgument(f"You can only have {MAX_WORDS} highlights.")
+
+        await self.bot.db.execute(
+            "INSERT INTO highlights (guild_id, user_id, word) VALUES ($1, $2, $3) "
+            "ON CONFLICT DO NOTHING",
+            ctx.guild.id,
+            ctx.author.id,
+            word,
+        )
+        words = self.bot.highlights.setdefault(ctx.guild.id, {})
+        if word not in words:
+            # only a new word changes what the pattern has to match
+            self.matchers.pop(ctx.guild.id, None)
+        words.setdefault(word, set()).add(ctx.author.id)
+        await ctx.send(
+            embed=ctx.embed(description=f"Added `{word}` to your highlights.")
+        )
+
+    @highlight.command(name="remove", aliases=["delete"])
+    async def highlight_remove(self, ctx, *, word: str):
+        """Removes a word from your highlights in this server."""
+        word = word.lower().strip()
+        users = self.bot.highlights.get(ctx.guild.id, {}).get(word)
+        if not users or ctx.author.id not in users:
+            raise commands.BadArgument("This isn't one of your highlights.")
+
+        await self.bot.db.execute(
+            "DELETE FROM highlights WHERE guild_id = $1 AND user_id = $2 AND word = $3",
+            ctx.guild.id,
+            ctx.author.id,
+            word,
+        )
+        users.discard(ctx.author.id)
+        if not users:
+            del self.bot.highlights[ctx.guild.id][word]
+            self.matchers.pop(ctx.guild.id, None)
+        await ctx.send(
+            embed=ctx.embed(description=f"Removed `{word}` from your highlights.")
+        )
+
+    @highlight.command(name="list")
+    async def highlight_list(self, ctx):
+        """Lists your highlights in this server."""
+        words = self.get_words(ctx.guild.id, ctx.author.id)
+        if not words:
+            return await ctx.send(
+                embed=ctx.embed(description="You don't have any highlights here.")
+            )
+        await ctx.send(
+            embed=ctx.embed(
+                title=f"Your highlights on {ctx.guild.name}",
+                description="\n".join(f"`{word}`" for word in words),
+            )
+        )
+
+
+def setup(bot):
+    bot.add_cog(Highlights(bot))
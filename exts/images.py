@@ -46,7 +46,7 @@ class Images(commands.Cog):
         await ctx.send(embed=embed, file=file)
 
     async def do_neko_image(self, ctx, endpoint, key="message"):
-        async with self.bot.session.get(NEKOBOT_URL + endpoint) as resp:
+        async with self.bot.web.get(NEKOBOT_URL + endpoint) as resp:
             data = await resp.json()
         embed = ctx.embed().set_image(url=data[key])
         await ctx.send(embed=embed)
@@ -107,7 +107,7 @@ class Images(commands.Cog):
 
     @commands.command()
     async def fakecat(self, ctx):
-        async with self.bot.session.get("https://thiscatdoesnotexist.com/") as resp:
+        async with self.bot.web.get("https://thiscatdoesnotexist.com/") as resp:
             file = discord.File(io.BytesIO(await resp.read()), "fake.png")
         embed = ctx.embed(title="This cat does not exist.").set_image(
             url="attachment://fake.png"
@@ -116,9 +116,7 @@ class Images(commands.Cog):
 
     @commands.command()
     async def fakeperson(self, ctx):
-        async with self.bot.session.get(
-                "https://thispersondoesnotexist.com/image"
-        ) as resp:
+        async with self.bot.web.get("https://thispersondoesnotexist.com/image") as resp:
             file = discord.File(io.BytesIO(await resp.read()), "fake.png")
         embed = ctx.embed(title="This person does not exist.").set_image(
             url="attachment://fake.png"
@@ -127,7 +125,7 @@ class Images(commands.Cog):
 
     @commands.command()
     async def fakeartwork(self, ctx):
-        async with self.bot.session.get("https://thisartworkdoesnotexist.com/") as resp:
+        async with self.bot.web.get("https://thisartworkdoesnotexist.com/") as resp:
             file = discord.File(io.BytesIO(await resp.read()), "fake.png")
         embed = ctx.embed(title="This artwork does not exist.").set_image(
             url="attachment://fake.png"
@@ -136,7 +134,7 @@ class Images(commands.Cog):
 
     @commands.command()
     async def fakehorse(self, ctx):
-        async with self.bot.session.get("https://thishorsedoesnotexist.com/") as resp:
+        async with self.bot.web.get("https://thishorsedoesnotexist.com/") as resp:
             file = discord.File(io.BytesIO(await resp.read()), "fake.png")
         embed = ctx.embed(title="This horse does not exist.").set_image(
             url="attachment://fake.png"
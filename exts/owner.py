@@ -155,6 +155,67 @@ class Owner(commands.Cog, command_attrs=dict(hidden=True)):
             return await ctx.send(str(err))
         await ctx.send(f"Successfully reloaded {name}")
 
+    @dev.command(name="messages")
+    async def dev_messages(self, ctx):
+        """Shows where incoming messages stopped on their way to becoming commands."""
+        stats = self.bot.message_stats
+        total = sum(stats.values())
+        rows = [
+            {"stage": stage, "messages": count, "share": f"{count / total:.1%}"}
+            for stage, count in stats.most_common()
+        ]
+        table = tabulate.tabulate(rows, headers="keys", tablefmt="github")
+        await ctx.send(
+            embed=ctx.embed(
+                title=f"{total:,} messages seen", description=f"```yaml\n{table}```"
+            )
+        )
+
+    @dev.command(name="images")
+    async def dev_images(self, ctx):
+        """Shows how busy the image workers are, how long their jobs take and what they send."""
+        pool = self.bot.image_pool
+        table = tabulate.tabulate(pool.stats(), headers="keys", tablefmt="github")
+        outputs = tabulate.tabulate(
+            pool.output_stats(), headers="keys", tablefmt="github"
+        )
+        description = (
+            f"Workers: {pool.running}/{pool.workers} busy\n"
+            f"Queued: {pool.queued}/{pool.max_queue} across {len(pool.queues)} guilds\n"
+            f"Turned away: {pool.rejected}\n"
+            f"```yaml\n{table or 'No jobs yet.'}```"
+            f"```yaml\n{outputs or 'No images sent yet.'}```"
+        )
+        await ctx.send(embed=ctx.embed(title="Image Workers", description=description))
+
+    @dev.command(name="http")
+    async def dev_http(self, ctx, host: str = None):
+        """Shows how the APIs the bot uses are doing, or the latency histogram of one of them."""
+        web = self.bot.web
+        if host is None:
+            rows = web.stats()
+            title = "Outgoing Requests"
+        else:
+            rows = web.histogram(host)
+            title = f"Latency of {host}"
+        table = tabulate.tabulate(rows, headers="keys", tablefmt="github")
+        await ctx.send(
+            embed=ctx.embed(
+                title=title, description=f"```yaml\n{table or 'No requests yet.'}```"
+            )
+        )
+
+    @dev.command(name="reddit")
+    async def dev_reddit(self, ctx):
+        """Shows how full the subreddit post pools are and when they were last refreshed."""
+        cog = self.bot.get_cog("Reddit")
+        if cog is None:
+            return await ctx.send("The Reddit cog isn't loaded.")
+        table = tabulate.tabulate(cog.stats(), headers="keys", tablefmt="github")
+        await ctx.send(
+            embed=ctx.embed(title="Reddit Pools", description=f"```yaml\n{table}```")
+        )
+
     @commands.group()
     @commands.is_owner()
     async def change(self, ctx):
@@ -19,23 +19,40 @@ import random
 
 from discord.ext import commands
 
-WAIFU_URL = "https://waifu.pics/api/sfw/"
+from utils.urlpool import URLPool
+
+WAIFU_URL = "https://waifu.pics/api/many/sfw/"
 PURRBOT_URL = "https://purrbot.site/api"
 
 
 class Pictures(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # waifu.pics hands out 30 at a time, purrbot only one
+        self.waifus = URLPool(self.fetch_waifus, size=30, low_water=10, rate=1, per=1)
+        self.purrs = URLPool(self.fetch_purr, size=10, low_water=3, rate=2, per=1)
+
+    async def fetch_waifus(self, category) -> list:
+        exclude = list(self.waifus.pools[category])
+        async with self.bot.web.post(
+            WAIFU_URL + category, json={"exclude": exclude}
+        ) as resp:
+            resp.raise_for_status()
+            return (await resp.json())["files"]
+
+    async def fetch_purr(self, endpoint) -> list:
+        async with self.bot.web.get(PURRBOT_URL + endpoint) as resp:
+            resp.raise_for_status()
+            purr = await resp.json()
+        return [purr["link"]] if purr.get("link") else []
 
     async def send_waifu(self, ctx, category):
-        async with self.bot.session.get(WAIFU_URL + category) as resp:
-            waifu = await resp.json()
-        await ctx.send(embed=ctx.embed().set_image(url=waifu.get("url")))
+        url = await self.waifus.get(category)
+        await ctx.send(embed=ctx.embed().set_image(url=url))
 
     async def send_purr(self, ctx, endpoint):
-        async with self.bot.session.get(PURRBOT_URL + endpoint) as resp:
-            purr = await resp.json()
-        await ctx.send(embed=ctx.embed().set_image(url=purr.get("link")))
+        url = await self.purrs.get(endpoint)
+        await ctx.send(embed=ctx.embed().set_image(url=url))
 
     @commands.command()
     async def neko(self, ctx):
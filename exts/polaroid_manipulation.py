@@ -15,43 +15,103 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import functools
 import re
 import typing
 from io import BytesIO
 
 import discord
-import polaroid
 from discord.ext import commands
-from jishaku.functools import executor_function
+
+from utils import render
+from utils.download import download, is_image
+from utils.imagecache import content_hash
+
+URL_REGEX = re.compile(
+    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+)
+
+
+MAX_STEPS = 10
+MAX_FRAMES = 100
+MAX_PIXELS = 40_000_000
+
+# what every Polaroid command does, so they can be chained with the pipeline command
+OPERATIONS = {
+    "rainbow": ("apply_gradient", ()),
+    "wide": ("resize", (2000, 900, 1)),
+    "invert": ("invert", ()),
+    "flip": ("fliph", ()),
+    "colorize": ("colorize", ()),
+    "blur": ("box_blur", ()),
+    "sobelh": ("sobel_horizontal", ()),
+    "sobelv": ("sobel_vertical", ()),
+    "decompose": ("decompose_max", ()),
+    "grayscale": ("grayscale", ()),
+    "solarize": ("solarize", ()),
+    "sideways": ("rotate90", ()),
+    "upsidedown": ("rotate180", ()),
+    "monochrome": ("monochrome", ()),
+    "emboss": ("emboss", ()),
+    "edges": ("edge_detection", ()),
+    "oil": ("oil", (4, 55)),
+    "rose": ("filter", ("rosetint",)),
+    "pink": ("filter", ("pastel_pink",)),
+    "liquid": ("filter", ("liquid",)),
+    "dramatic": ("filter", ("dramatic",)),
+    "firenze": ("filter", ("firenze",)),
+    "golden": ("filter", ("golden",)),
+    "lix": ("filter", ("lix",)),
+    "neue": ("filter", ("neue",)),
+    "obsidian": ("filter", ("obsidian",)),
+    "ryo": ("filter", ("ryo",)),
+}
+
+
+class Operations(commands.Converter):
+    """Turns `invert,blur` or `invert+blur` into the steps for those operations."""
+
+    async def convert(self, ctx, argument):
+        steps = []
+        for name in re.split(r"[,+>|]+", argument.lower()):
+            if not name:
+                continue
+            if name not in OPERATIONS:
+                raise commands.BadArgument(f"{name} isn't an image operation.")
+            steps.append(OPERATIONS[name])
+        return steps
+
+
+async def get_avatar(ctx, user):
+    # animated avatars come as gifs
+    avatar = user.avatar_url_as(static_format="png")
+    return await ctx.bot.images.get(("avatar", str(avatar)), avatar.read)
 
 
 async def get_image_object(ctx, image):
+    images = ctx.bot.images
     if ctx.message.attachments:
-        img = await ctx.message.attachments[0].read()
+        attachment = ctx.message.attachments[0]
+        img = await images.get(("attachment", attachment.id), attachment.read)
 
     elif isinstance(image, discord.PartialEmoji):
-        img = await image.url.read()
+        img = await images.get(("emoji", image.id), image.url.read)
 
     elif isinstance(image, (discord.Member, discord.User)):
-        img = await image.avatar_url_as(format="png").read()
+        img = await get_avatar(ctx, image)
 
     elif image is None:
-        img = await ctx.author.avatar_url_as(format="png").read()
+        img = await get_avatar(ctx, ctx.author)
     else:
         url = str(image).strip("<>")
-        if re.match(
-            r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+",
-            url,
-        ):
-            async with ctx.bot.session.get(url) as resp:
-                if resp.headers["Content-type"].startswith("image"):
-                    img = await resp.read()
-                else:
-                    img = None
+        if URL_REGEX.match(url):
+            img = await images.get(
+                ("url", url), functools.partial(download, ctx.bot.web, url)
+            )
         else:
             img = None
     if not img:
-        img = await ctx.author.avatar_url_as(format="png").read()
+        img = await get_avatar(ctx, ctx.author)
     return img
 
 
@@ -69,12 +129,11 @@ async def get_image_url(ctx, image):
         img = ctx.author.avatar_url
     else:
         url = str(image).strip("<>")
-        if re.match(
-            r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+",
-            url,
-        ):
-            async with ctx.bot.session.get(url) as resp:
-                img = url if resp.headers["Content-type"].startswith("image") else None
+        if ("url", url) in ctx.bot.images:
+            # it was downloaded before, so it is an image
+            img = url
+        elif URL_REGEX.match(url):
+            img = url if await is_image(ctx.bot.web, url) else None
         else:
             img = None
     if not img:
@@ -86,27 +145,59 @@ class Polaroid(commands.Cog, command_attrs=dict(hidden=False)):
     def __init__(self, bot):
         self.bot = bot
 
-    @executor_function
-    def do_polaroid(self, img, method: str, args: list = None, kwargs: dict = None):
-        img = polaroid.Image(img)
-        if args is None:
-            args = []
-        if kwargs is None:
-            kwargs = {}
-        method = getattr(img, method)
-        method(*args, **kwargs)
-        return img
-
-    async def send_polaroid(self, ctx, image, method: str, *args, **kwargs):
+    async def send_polaroid(self, ctx, image, method: str, args: list = ()):
+        await self.send_steps(ctx, image, ((method, tuple(args)),), name=method)
+
+    async def render(self, ctx, image: bytes, steps: tuple) -> render.Encoded:
+        """
+        Runs `steps` on an image in the image workers.
+        The frames of animated images are split up between some of the workers and put back together as a GIF.
+        """
+        pool = self.bot.image_pool
+        if render.is_animated(image):
+            try:
+                split = await pool.run(
+                    ctx, render.split_frames, image, MAX_FRAMES, MAX_PIXELS
+                )
+            except render.TooLarge as e:
+                raise commands.BadArgument(str(e))
+            if split is not None:
+                frames, durations, loop = split
+                # half the workers at most, so other images don't wait on one animation
+                size = -(-len(frames) // max(1, pool.workers // 2))
+                # the budget is for what comes out of the steps too, not just what goes in
+                max_frame_pixels = MAX_PIXELS // len(frames)
+                chunks = await pool.run_many(
+                    ctx,
+                    render.do_polaroid_frames,
+                    [
+                        (frames[i : i + size], steps, max_frame_pixels)
+                        for i in range(0, len(frames), size)
+                    ],
+                )
+                frames = [frame for chunk in chunks for frame in chunk]
+                return await pool.render(
+                    ctx, render.join_frames, frames, durations, loop
+                )
+        return await pool.render(ctx, render.do_polaroid, image, steps)
+
+    async def send_steps(self, ctx, image, steps: tuple, name: str):
         try:
             image = await get_image_object(ctx, image)
+        except commands.BadArgument:
+            raise
         except:
-            await ctx.send(embed=ctx.embed(description="Invalid URL provided."))
-        img = await self.do_polaroid(image, method, *args, **kwargs)
-        file = discord.File(BytesIO(img.save_bytes()), filename=f"{method}.png")
+            return await ctx.send(embed=ctx.embed(description="Invalid URL provided."))
+        key = (content_hash(image), steps)
+        img = self.bot.image_results.get(key)
+        if img is None:
+            img = (await self.render(ctx, image, steps)).data
+            self.bot.image_results[key] = img
+        name = f"{name}.{render.extension(img)}"
+        file = discord.File(BytesIO(img), filename=name)
 
         embed = ctx.embed()
-        embed.set_image(url=f"attachment://{method}.png")
+        embed.set_image(url=f"attachment://{name}")
         await ctx.send(embed=embed, file=file)
 
     @commands.command(help="Makes an image rainbowey")
@@ -411,6 +502,35 @@ class Polaroid(commands.Cog, command_attrs=dict(hidden=False)):
     ):
         await self.send_polaroid(ctx, image, method="filter", args=["ryo"])
 
+    @commands.command(aliases=["chain"], usage="<operations...> [image]")
+    async def pipeline(
+        self,
+        ctx,
+        operations: commands.Greedy[Operations],
+        *,
+        image: typing.Union[
+            discord.PartialEmoji, discord.Member, discord.User, str
+        ] = None,
+    ):
+        """Runs several image commands on an image in one go.
+
+        Arguments:
+            `operations`: The commands to run, in order, like `invert blur wide`.
+            `image`: [Optional] This can be an emoji, a url, or a user."""
+        steps = tuple(step for steps in operations for step in steps)
+        if not steps:
+            return await ctx.send(
+                embed=ctx.embed(
+                    title="Which operations do you want to run?",
+                    description=", ".join(f"`{name}`" for name in OPERATIONS),
+                )
+            )
+        if len(steps) > MAX_STEPS:
+            raise commands.BadArgument(
+                f"You can only chain up to {MAX_STEPS} operations."
+            )
+        await self.send_steps(ctx, image, steps, name="pipeline")
+
 
 def setup(bot):
     bot.add_cog(Polaroid(bot))
@@ -24,6 +24,13 @@ class Prefixes(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    def get_prefixes(self, guild_id: int) -> list:
+        """The prefixes of a guild, starting out with the default prefix if it has none."""
+        prefixes = self.bot.prefixes[guild_id]
+        if not prefixes:
+            prefixes.append(self.bot.default_prefix)
+        return prefixes
+
     @commands.group()
     async def prefix(self, ctx):
         if ctx.invoked_subcommand is None:
@@ -32,7 +39,8 @@ class Prefixes(commands.Cog):
     @prefix.command()
     @mng_gld()
     async def add(self, ctx, prefix):
-        if prefix in self.bot.prefixes[ctx.guild.id]:
+        prefixes = self.get_prefixes(ctx.guild.id)
+        if prefix in prefixes:
             return await ctx.send(
                 embed=ctx.embed(description="This is already a prefix.")
             )
@@ -44,19 +52,22 @@ class Prefixes(commands.Cog):
         )
 
         await self.bot.db.execute(sql, ctx.guild.id, prefix)
-        self.bot.prefixes[ctx.guild.id].append(prefix)
+        prefixes.append(prefix)
+        self.bot.prefix_matcher.invalidate(ctx.guild.id)
         await ctx.send(embed=ctx.embed(description=f"Added prefix `{prefix}`"))
 
     @prefix.command()
     @mng_gld()
     async def remove(self, ctx, prefix):
-        if prefix not in self.bot.prefixes[ctx.guild.id]:
+        prefixes = self.get_prefixes(ctx.guild.id)
+        if prefix not in prefixes:
             return await ctx.send(
                 embed=ctx.embed(description="Invalid prefix provided.")
             )
         sql = "DELETE FROM prefixes " "WHERE guild_id = $1 AND prefix = $2"
         await self.bot.db.execute(sql, ctx.guild.id, prefix)
-        self.bot.prefixes[ctx.guild.id].remove(prefix)
+        prefixes.remove(prefix)
+        self.bot.prefix_matcher.invalidate(ctx.guild.id)
         await ctx.send(embed=ctx.embed(description=f"Removed `{prefix}`"))
 
     @prefix.command()
@@ -74,8 +85,10 @@ class Prefixes(commands.Cog):
             "VALUES ($1, $2) ON CONFLICT (guild_id, prefix) DO UPDATE SET prefix = $2"
         )
         await self.bot.db.execute(insertion_sql, ctx.guild.id, prefix)
-        self.bot.prefixes[ctx.guild.id].remove(ctx.prefix)
-        self.bot.prefixes[ctx.guild.id].append(prefix)
+        prefixes = self.get_prefixes(ctx.guild.id)
+        prefixes.remove(ctx.prefix)
+        prefixes.append(prefix)
+        self.bot.prefix_matcher.invalidate(ctx.guild.id)
         await ctx.send(
             embed=ctx.embed(description=f"Edited `{ctx.prefix}` to `{prefix}`")
         )
@@ -83,10 +96,11 @@ class Prefixes(commands.Cog):
     @prefix.command()
     async def all(self, ctx):
         """View the prefixes on this server."""
-        prefixes = '"\n"'.join(self.bot.prefixes[ctx.guild.id])
+        prefixes = self.get_prefixes(ctx.guild.id)
+        joined = '"\n"'.join(prefixes)
         embed = ctx.embed(
-            title=f"{ctx.plural('Prefix(s)', len(self.bot.prefixes[ctx.guild.id]))} on {ctx.guild.name}",
-            description=f'```yaml\n"{prefixes}"```',
+            title=f"{ctx.plural('Prefix(s)', len(prefixes))} on {ctx.guild.name}",
+            description=f'```yaml\n"{joined}"```',
         )
         await ctx.send(embed=embed)
 
@@ -15,28 +15,187 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import asyncio
+import collections
 import random
+import time
 
-from discord.ext import commands
+import aiohttp
+from discord.ext import commands, tasks
+
+from utils import create_logger
+from utils.cache import Coalescer, LRUCache
+from utils.http import CircuitOpen
+
+logger = create_logger("Reddit")
+
+SUBREDDITS = ("chonkers", "me_irl", "dankmemes", "memes", "programmerhumor")
+PAGES = 3
+PAGE_SIZE = 100
+LOW_WATER = 20
+REFRESH_INTERVAL = 10
+MIN_REFRESH_GAP = 60
+RECENT_PER_CHANNEL = 50
+
+
+def to_post(data: dict):
+    """The parts of a listing child the embed needs, or `None` if it isn't an image post."""
+    if data.get("stickied") or "url_overridden_by_dest" not in data:
+        return None
+    url = data["url_overridden_by_dest"]
+    if data["url"].startswith("https://imgur.com/"):
+        url = data["url"]
+    return {
+        "id": data["id"],
+        "title": data["title"],
+        "permalink": data["permalink"],
+        "url": url,
+    }
+
+
+class PostPool:
+    """The posts of a subreddit that haven't been sent yet, refilled from its hot listing."""
+
+    __slots__ = ("posts", "refreshed_at", "attempted_at", "took", "served", "failed")
+
+    def __init__(self):
+        self.posts = []
+        self.refreshed_at = None
+        self.attempted_at = None
+        self.took = 0.0
+        self.served = 0
+        self.failed = 0
+
+    @property
+    def can_refresh(self) -> bool:
+        """Whether it's been long enough since the last try, so a small or failing listing isn't fetched on every command."""
+        return (
+            self.attempted_at is None
+            or time.monotonic() - self.attempted_at >= MIN_REFRESH_GAP
+        )
 
 
 class Reddit(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.pools = {name: PostPool() for name in SUBREDDITS}
+        self.recent = LRUCache(maxsize=1000)
+        self._refreshing = Coalescer()
+        self.refresh_pools.start()
+
+    def cog_unload(self):
+        self.refresh_pools.cancel()
+
+    async def fetch_posts(self, subreddit: str) -> list:
+        """Walks the first `PAGES` pages of a subreddit's hot listing."""
+        posts = []
+        seen = set()
+        after = None
+        for _ in range(PAGES):
+            params = {"limit": PAGE_SIZE, "raw_json": 1}
+            if after:
+                params["after"] = after
+            async with self.bot.web.get(
+                f"https://www.reddit.com/r/{subreddit}/hot.json", params=params
+            ) as resp:
+                resp.raise_for_status()
+                listing = (await resp.json())["data"]
+            for child in listing["children"]:
+                post = to_post(child["data"])
+                if post is not None and post["id"] not in seen:
+                    seen.add(post["id"])
+                    posts.append(post)
+            after = listing.get("after")
+            if not after:
+                break
+        return posts
+
+    async def refresh(self, subreddit: str):
+        """Replaces the pool of a subreddit with a fresh listing. Everyone refreshing the same one at once shares it."""
+        await self._refreshing.run(subreddit, lambda: self._refresh(subreddit))
+
+    async def _refresh(self, subreddit: str):
+        pool = self.pools[subreddit]
+        pool.attempted_at = time.monotonic()
+        start = time.perf_counter()
+        try:
+            posts = await self.fetch_posts(subreddit)
+        except (
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+            KeyError,
+            CircuitOpen,
+        ) as e:
+            pool.failed += 1
+            logger.warning("Could not refresh r/%s: %s", subreddit, e)
+            return
+        pool.posts = posts
+        pool.refreshed_at = time.monotonic()
+        pool.took = time.perf_counter() - start
+
+    @tasks.loop(minutes=REFRESH_INTERVAL)
+    async def refresh_pools(self):
+        await self.bot.wait_until_ready()
+        for subreddit in SUBREDDITS:
+            await self.refresh(subreddit)
+
+    def take_post(self, channel_id: int, subreddit: str):
+        """
+        Takes a random post out of the pool of a subreddit, preferring ones the channel hasn't seen lately.
+        Starts a refresh in the background when the pool runs low, at most once every `MIN_REFRESH_GAP` seconds.
+        """
+        pool = self.pools[subreddit]
+        if len(pool.posts) <= LOW_WATER and pool.can_refresh:
+            asyncio.ensure_future(self.refresh(subreddit))
+        if not pool.posts:
+            return None
+
+        recent = self.recent.get(channel_id)
+        if recent is None:
+            recent = self.recent[channel_id] = collections.deque(
+                maxlen=RECENT_PER_CHANNEL
+            )
+        unseen = [i for i, post in enumerate(pool.posts) if post["id"] not in recent]
+        post = pool.posts.pop(random.choice(unseen or range(len(pool.posts))))
+        recent.append(post["id"])
+        pool.served += 1
+        return post
+
+    def stats(self) -> list:
+        """A row per subreddit, for tabulate."""
+        now = time.monotonic()
+        return [
+            {
+                "subreddit": name,
+                "posts": len(pool.posts),
+                "served": pool.served,
+                "failed": pool.failed,
+                "refreshed": (
+                    "never"
+                    if pool.refreshed_at is None
+                    else f"{(now - pool.refreshed_at) / 60:.0f} min ago"
+                ),
+                "took": f"{pool.took * 1000:.0f} ms",
+            }
+            for name, pool in self.pools.items()
+        ]
 
-    async def create_message(self, ctx, subreddit: str, minimum: int = 1):
-        async with self.bot.session.get(
-            f"https://reddit.com/r/{subreddit}.json"
-        ) as resp:
-            res = await resp.json()
-        data = res["data"]["children"][random.randint(minimum, 26)]["data"]
+    async def create_message(self, ctx, subreddit: str):
+        post = self.take_post(ctx.channel.id, subreddit)
+        if post is None and self.pools[subreddit].can_refresh:
+            # nothing has been fetched yet, so wait for it this once
+            await self.refresh(subreddit)
+            post = self.take_post(ctx.channel.id, subreddit)
+        if post is None:
+            return await ctx.send(
+                embed=ctx.embed(
+                    description=f"Couldn't get any posts from r/{subreddit}."
+                )
+            )
         embed = ctx.embed(
-            title=data["title"], url=f"https://reddit.com{data['permalink']}"
+            title=post["title"], url=f"https://reddit.com{post['permalink']}"
         )
-        url = data["url_overridden_by_dest"]
-        if data["url"].startswith("https://imgur.com/"):
-            url = data["url"]
-        embed.set_image(url=url)
+        embed.set_image(url=post["url"])
         await ctx.send(embed=embed)
 
     @commands.command()
@@ -47,7 +206,7 @@ class Reddit(commands.Cog):
     @commands.command()
     async def me_irl(self, ctx):
         """Sends a random post from the subreddit "me_irl"."""
-        await self.create_message(ctx, "me_irl", minimum=2)
+        await self.create_message(ctx, "me_irl")
 
     @commands.command()
     async def dankmeme(self, ctx):
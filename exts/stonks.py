@@ -15,6 +15,7 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import asyncio
 import math
 
 import discord
@@ -22,10 +23,108 @@ import humanize
 import tabulate
 from discord.ext import commands, tasks
 
-from utils.eco import get_stats
+from utils.cache import Coalescer, TTLCache
+from utils.eco import cache_balance, get_stats
 
 FINNHUB_URL = "https://finnhub.io/api/v1/"
 
+QUOTE_TTL = 15
+SEARCH_TTL = 3600
+FINNHUB_CONCURRENCY = 5
+
+
+class QuoteService:
+    """
+    Finnhub lookups shared by every stock command.
+    Quotes are cached for a few seconds, and people asking for the same ticker at the same time share one request.
+    Finnhub has no multi-symbol quote endpoint, so lookups for many tickers are sent concurrently instead.
+    """
+
+    def __init__(self, bot, token: str):
+        self.bot = bot
+        self.token = token
+        self.quotes = TTLCache(ttl=QUOTE_TTL, maxsize=2048)
+        self.searches = TTLCache(ttl=SEARCH_TTL, maxsize=1024)
+        self.inflight = Coalescer()
+        self.requests = 0
+        self._semaphore = asyncio.Semaphore(FINNHUB_CONCURRENCY)
+
+    async def _get(self, endpoint: str, **params) -> dict:
+        params["token"] = self.token
+        async with self._semaphore:
+            self.requests += 1
+            async with self.bot.web.get(FINNHUB_URL + endpoint, params=params) as r:
+                if r.status != 200:
+                    raise commands.BadArgument(
+                        "Couldn't reach the stock market right now, try again in a bit."
+                    )
+                return await r.json()
+
+    async def quote(self, ticker: str) -> dict:
+        ticker = ticker.upper()
+        data = self.quotes.get(ticker)
+        if data is None:
+            data = await self.inflight.run(
+                ("quote", ticker), lambda: self._fetch_quote(ticker)
+            )
+        return data
+
+    async def _fetch_quote(self, ticker: str) -> dict:
+        data = await self._get("quote", symbol=ticker)
+        self.quotes[ticker] = data
+        return data
+
+    async def quote_many(self, tickers) -> dict:
+        """Returns a dict of ticker -> quote."""
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        quotes = await asyncio.gather(*map(self.quote, tickers))
+        return dict(zip(tickers, quotes))
+
+    async def prices(self, tickers) -> dict:
+        """Returns a dict of ticker -> current price, fetched concurrently. Unknown tickers are worth 0."""
+        quotes = await self.quote_many(tickers)
+        return {ticker: quote.get("c") or 0 for ticker, quote in quotes.items()}
+
+    async def search(self, query: str) -> dict:
+        query = query.upper()
+        data = self.searches.get(query)
+        if data is None:
+            data = await self.inflight.run(
+                ("search", query), lambda: self._fetch_search(query)
+            )
+        return data
+
+    async def _fetch_search(self, query: str) -> dict:
+        data = await self._get("search", q=query)
+        self.searches[query] = data
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "Requests": self.requests,
+            "Quote hits": self.quotes.hits,
+            "Quote misses": self.quotes.misses,
+            "Search hits": self.searches.hits,
+            "Search misses": self.searches.misses,
+            "Coalesced": self.inflight.coalesced,
+        }
+
+
+def value_positions(rows, prices: dict):
+    """
+    Values `ticker, amount` rows against one price snapshot.
+    Returns a list of (ticker, amount, price, value) and the total value.
+    """
+    positions = []
+    total = 0
+    for row in rows:
+        price = prices.get(row["ticker"], 0)
+        value = round(price * row["amount"])
+        positions.append((row["ticker"], row["amount"], price, value))
+        total += value
+    positions.sort(key=lambda position: position[3], reverse=True)
+    return positions, total
+
 
 class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
     """
@@ -37,8 +136,16 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
         """Creates the cog."""
         self.bot = bot
         self.finnhub = self.bot.settings["keys"]["finnhub"]
+        self.quotes = QuoteService(bot, self.finnhub)
+        self.bot.caches["stock quotes"] = self.quotes.quotes
+        self.bot.caches["stock searches"] = self.quotes.searches
         self.del_none.start()
 
+    def cog_unload(self):
+        self.del_none.cancel()
+        self.bot.caches.pop("stock quotes", None)
+        self.bot.caches.pop("stock searches", None)
+
     @tasks.loop(hours=12)
     async def del_none(self):
         await self.bot.db.execute("DELETE FROM stocks WHERE amount = 0")
@@ -63,10 +170,7 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
         cash, _ = await get_stats(ctx, ctx.author.id)
         ticker = ticker.upper()
 
-        async with self.bot.session.get(
-            f"{FINNHUB_URL}/quote?symbol={ticker}&token={self.finnhub}"
-        ) as data:
-            stock = await data.json()
+        stock = await self.quotes.quote(ticker)
 
         if stock["c"] == 0:
             return await ctx.send("Invalid stock provided.")
@@ -111,12 +215,14 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
                 "DO UPDATE SET amount = stocks.amount + $4"
             )
 
-            eco_values = (cash - total, ctx.author.id, ctx.guild.id)
+            eco_values = (total, ctx.author.id, ctx.guild.id)
 
-            await self.bot.db.execute(
-                "UPDATE economy SET cash = $1 WHERE user_id = $2 AND guild_id = $3",
+            row = await self.bot.db.fetchrow(
+                "UPDATE economy SET cash = cash - $1, version = version + 1 "
+                "WHERE user_id = $2 AND guild_id = $3 RETURNING cash, bank, version",
                 *eco_values,
             )
+            cache_balance(self.bot, ctx.guild.id, ctx.author.id, row)
             await self.bot.db.execute(
                 stock_sql, ctx.guild.id, ctx.author.id, ticker, amount
             )
@@ -149,10 +255,7 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
             amount = check
         amount = int(amount)
 
-        async with self.bot.session.get(
-            f"{FINNHUB_URL}/quote?symbol={ticker}&token={self.finnhub}"
-        ) as r:
-            data: dict = await r.json()
+        data: dict = await self.quotes.quote(ticker)
 
         if data["c"] == 0:
             return await ctx.send("Invalid stock provided.")
@@ -179,13 +282,14 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
             )
             stock_values = (amount, ticker, ctx.author.id, ctx.guild.id)
 
-            wallet, _ = await get_stats(ctx, ctx.author.id)
-            eco_values = (wallet + total, ctx.author.id, ctx.guild.id)
+            eco_values = (total, ctx.author.id, ctx.guild.id)
 
-            await self.bot.db.execute(
-                "UPDATE economy SET cash = $1 WHERE user_id = $2 AND guild_id = $3",
+            row = await self.bot.db.fetchrow(
+                "UPDATE economy SET cash = cash + $1, version = version + 1 "
+                "WHERE user_id = $2 AND guild_id = $3 RETURNING cash, bank, version",
                 *eco_values,
             )
+            cache_balance(self.bot, ctx.guild.id, ctx.author.id, row)
             await self.bot.db.execute(stock_sql, *stock_values)
 
             await message.edit(
@@ -200,8 +304,8 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
             user = ctx.author
 
         query = """
-            SELECT ticker, amount FROM stocks 
-            WHERE user_id = $1 AND guild_id = $2
+            SELECT ticker, amount FROM stocks
+            WHERE user_id = $1 AND guild_id = $2 AND amount > 0
             """
 
         stuff = await self.bot.db.fetch(query, user.id, ctx.guild.id)
@@ -210,22 +314,66 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
                 f"{user.mention} has no stocks",
                 allowed_mentions=discord.AllowedMentions().none(),
             )
+
+        prices = await self.quotes.prices(row["ticker"] for row in stuff)
+        positions, total = value_positions(stuff, prices)
         table = tabulate.tabulate(
-            (dict(thing) for thing in stuff if thing["amount"] != 0),
-            headers="keys",
+            (
+                (ticker, amount, f"${price:,.2f}", f"${value:,}")
+                for ticker, amount, price, value in positions
+            ),
+            headers=("ticker", "amount", "price", "value"),
             tablefmt="github",
         )
-        embed = ctx.embed(title=f"{user}'s stocks:", description=f"```py\n{table}```")
+        embed = ctx.embed(
+            title=f"{user}'s stocks:",
+            description=f"```py\n{table}```\n"
+            f"💰 **Total value:** ${humanize.intcomma(total)}",
+        )
         await ctx.send(embed=embed)
 
+    @commands.command(aliases=["richest_investors", "stocklb"])
+    async def investors(self, ctx):
+        """
+        Sends the richest investors on this server.
+        Everyone is valued with the same prices, which are fetched once for every ticker owned on the server.
+        """
+        query = """
+            SELECT user_id, ticker, amount FROM stocks
+            WHERE guild_id = $1 AND amount > 0
+            """
+        rows = await self.bot.db.fetch(query, ctx.guild.id)
+        if not rows:
+            return await ctx.send("Nobody on this server owns any stocks.")
+
+        prices = await self.quotes.prices(row["ticker"] for row in rows)
+        holdings = {}
+        for row in rows:
+            holdings.setdefault(row["user_id"], []).append(row)
+        totals = sorted(
+            (
+                (value_positions(user_rows, prices)[1], user_id)
+                for user_id, user_rows in holdings.items()
+            ),
+            reverse=True,
+        )[:10]
+
+        names = await self.bot.resolve_users(user_id for _, user_id in totals)
+        lb = [
+            f"**{number}.** {discord.utils.escape_markdown(names[user_id])} » **${humanize.intcomma(total)}**"
+            for number, (total, user_id) in enumerate(totals, start=1)
+        ]
+        await ctx.send(
+            embed=ctx.embed(
+                title=f"{ctx.guild.name} Investors", description="\n".join(lb)
+            )
+        )
+
     @commands.command(help="Looks up a stocks price.", aliases=["stock_lookup"])
     async def lookup(self, ctx, ticker: str):
         ticker = ticker.upper()
 
-        async with self.bot.session.get(
-            f"{FINNHUB_URL}/quote?symbol={ticker}&token={self.finnhub}"
-        ) as r:
-            data: dict = await r.json()
+        data: dict = await self.quotes.quote(ticker)
 
         if data["c"] == 0:
             return await ctx.send("Yeah so that's not a valid stock lmao")
@@ -244,10 +392,7 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
     @commands.command(help="Search to see if a stock ticker exists.")
     async def check(self, ctx, search):
         search = search.upper()
-        async with self.bot.session.get(
-            f"{FINNHUB_URL}/search?q={search}&token={self.finnhub}"
-        ) as r:
-            data: dict = await r.json()
+        data: dict = await self.quotes.search(search)
 
         if not data["result"]:
             return await ctx.message.add_reaction("❌")
@@ -257,6 +402,14 @@ class Stocks(commands.Cog, command_attrs=dict(hidden=False)):
         else:
             await ctx.message.add_reaction("❌")
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def quotestats(self, ctx):
+        """Shows how many Finnhub requests the quote cache has saved."""
+        stats = self.quotes.stats()
+        text = "\n".join(f"{name}: {value}" for name, value in stats.items())
+        await ctx.send(f"```yaml\n{text}```")
+
 
 def setup(bot):
     bot.add_cog(Stocks(bot))
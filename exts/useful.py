@@ -232,7 +232,7 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
 
         Arguments:
             `package`: The package you want to search for."""
-        async with self.bot.session.get(f"https://pypi.org/pypi/{package}/json") as f:
+        async with self.bot.web.get(f"https://pypi.org/pypi/{package}/json") as f:
             if not f or f.status != 200:
                 return await ctx.send(embed=ctx.embed(description="Package not found."))
             package = await f.json()
@@ -268,9 +268,7 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
 
         Arguments:
             `author name/repo name`: The repo to lookup. Example: `{prefix}github Daggy1234/dagpi`"""
-        async with self.bot.session.get(
-            f"https://api.github.com/repos/{repo_name}"
-        ) as res:
+        async with self.bot.web.get(f"https://api.github.com/repos/{repo_name}") as res:
             if res.status != 200:
                 raise commands.BadArgument("Invalid repo provided.")
             data = await res.json()
@@ -278,7 +276,7 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
             "sha": data["default_branch"],
             "per_page": 1,
         }
-        async with self.bot.session.get(
+        async with self.bot.web.get(
             f"https://api.github.com/repos/{data['full_name']}/commits", params=params
         ) as resp:
             commit_count = len(await resp.json())
@@ -331,7 +329,7 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
             "requestedAttributes: {TOXICITY:{}, SEVERE_TOXICITY:{}, SPAM: {}, UNSUBSTANTIAL:{}, OBSCENE: {}, INFLAMMATORY: {}, INCOHERENT: {}} }"
         )
 
-        async with self.bot.session.post(url, headers=headers, data=data) as res:
+        async with self.bot.web.post(url, headers=headers, data=data) as res:
             js = await res.json()
 
         items = {
@@ -372,7 +370,7 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
 
     @commands.command(help="Sends the 5 most recent commits to the bot.")
     async def recent_commits(self, ctx):
-        async with self.bot.session.get(
+        async with self.bot.web.get(
             "https://api.github.com/repos/ppotatoo/Penguin/commits"
         ) as f:
             resp = await f.json()
@@ -545,20 +543,32 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
             allowed_mentions=discord.AllowedMentions().none(),
         )
 
+    def afk_mentions(self, message) -> dict:
+        """
+        Finds the AFK users a message pings.
+        Only looks at who got mentioned, so it doesn't matter how many people are AFK.
+        """
+        afk = self.bot.afk
+        return {user.id: user for user in message.mentions if user.id in afk}
+
     @commands.Cog.listener()
     async def on_message(self, message):
-        if message.author.id in self.bot.afk.keys():
+        if not self.bot.afk:
+            return
+        if message.author.id in self.bot.afk:
             del self.bot.afk[message.author.id]
+            await self.bot.db.execute(
+                "DELETE FROM afk WHERE user_id = $1", message.author.id
+            )
             return await message.channel.send(
                 f"Welcome back, {message.author.mention}, I have removed your AFK status."
             )
-        for user_id, data in self.bot.afk.items():
-            user = await self.bot.try_user(user_id)
-            if user.mentioned_in(message):
-                ago = humanize.naturaltime(datetime.datetime.utcnow() - data["time"])
-                await message.channel.send(
-                    f"<:whenyahomiesaysomewildshit:596577153135673344> Hey, but {user.name} went AFK {ago} for `{data['reason']}`"
-                )
+        for user_id, user in self.afk_mentions(message).items():
+            data = self.bot.afk[user_id]
+            ago = humanize.naturaltime(datetime.datetime.utcnow() - data["time"])
+            await message.channel.send(
+                f"<:whenyahomiesaysomewildshit:596577153135673344> Hey, but {user.name} went AFK {ago} for `{data['reason']}`"
+            )
 
     @commands.command()
     async def afk(self, ctx, *, reason: str):
@@ -566,10 +576,13 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
         This marks you as AFK.
         When someone pings you while you are AFK, it will let them know that you are AFK, how long you have been AFK, and your reason.
         """
-        self.bot.afk[ctx.author.id] = {
-            "reason": reason,
-            "time": datetime.datetime.utcnow(),
-        }
+        now = datetime.datetime.utcnow()
+        sql = (
+            "INSERT INTO afk (user_id, reason, time) VALUES ($1, $2, $3) "
+            "ON CONFLICT (user_id) DO UPDATE SET reason = $2, time = $3"
+        )
+        await self.bot.db.execute(sql, ctx.author.id, reason, now)
+        self.bot.afk[ctx.author.id] = {"reason": reason, "time": now}
         await ctx.send(f"OK, I have set your AFK status to `{reason}`")
 
     @commands.command()
@@ -581,7 +594,7 @@ class Useful(commands.Cog, command_attrs=dict(hidden=False)):
             `user`: [Optional] The user who's pronouns you want to check."""
         user = user or ctx.author
         params = {"platform": "discord", "id": user.id}
-        async with self.bot.session.get(
+        async with self.bot.web.get(
             "https://pronoundb.org/api/v1/lookup", params=params
         ) as f:
             if f.status == 404:
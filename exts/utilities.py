@@ -24,13 +24,11 @@ import string
 
 import aiohttp as aiohttp
 import discord
-import numpy as np
 from discord.ext import commands, flags
-from jishaku.functools import executor_function
 from jishaku.paginators import PaginatorInterface, WrappedPaginator
 from tabulate import tabulate
 
-from utils.fuzzy import finder
+from utils import similarity
 
 
 class DeletedMessage:
@@ -66,8 +64,9 @@ class Utilities(commands.Cog):
 
     @commands.Cog.listener()
     async def on_message(self, message):
-        not_owner = not await self.bot.is_owner(message.author)
-        if not_owner or message.author.bot:
+        if message.author.bot or ";" not in message.content:
+            return
+        if not await self.bot.is_owner(message.author):
             return
 
         matches = self.match.findall(message.content)
@@ -75,7 +74,7 @@ class Utilities(commands.Cog):
             return
         emoji = []
         for match in matches:
-            e = finder(match, self.bot.emojis, key=lambda emoji: emoji.name, lazy=False)
+            e = self.bot.emoji_index.search(match, limit=1)
             if e == []:
                 continue
             e = e[0]
@@ -90,12 +89,7 @@ class Utilities(commands.Cog):
     async def emojis(self, ctx, search=None):
         emojis = []
         if search:
-            result = finder(
-                text=search,
-                collection=self.bot.emojis,
-                key=lambda emoji: emoji.name,
-                lazy=False,
-            )
+            result = self.bot.emoji_index.search(search)
             if result == []:
                 return await ctx.send("Nothing found for your query.")
             for emoji in result:
@@ -109,31 +103,9 @@ class Utilities(commands.Cog):
         interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
         await interface.send_to(ctx)
 
-    @executor_function
-    def levenshtein_match_calc(self, s, t):
-        rows = len(s) + 1
-        cols = len(t) + 1
-        distance = np.zeros((rows, cols), dtype=int)
-
-        for i in range(1, rows):
-            for k in range(1, cols):
-                distance[i][0] = i
-                distance[0][k] = k
-
-        for col in range(1, cols):
-            for row in range(1, rows):
-                cost = 0 if s[row - 1] == t[col - 1] else 2
-                distance[row][col] = min(
-                    distance[row - 1][col] + 1,  # Cost of deletions
-                    distance[row][col - 1] + 1,  # Cost of insertions
-                    distance[row - 1][col - 1] + cost,
-                )  # Cost of substitutions
-        Ratio = ((len(s) + len(t)) - distance[row][col]) / (len(s) + len(t))
-        return int(Ratio * 100)
-
     @commands.command(help="Compares the similarity of two strings")
     async def fuzzy(self, ctx, string1, string2):
-        result = await self.levenshtein_match_calc(string1, string2)
+        result = int(similarity.ratio(string1, string2) * 100)
         await ctx.send(
             embed=ctx.embed(
                 description=f"`{string1}` and `{string2}` are `{result}%` similar."
@@ -255,12 +227,12 @@ class Utilities(commands.Cog):
         match = url_regex.match(url)
         if not match:
             raise commands.BadArgument("Invalid URL provided.")
-        async with self.bot.session.get(url) as redirect:
+        async with self.bot.web.get(url) as redirect:
             await ctx.send(embed=ctx.embed(description=f"`{str(redirect.real_url)}`"))
 
     @commands.command(aliases=["ip", "iplookup"])
     async def ipcheck(self, ctx, ip):
-        async with self.bot.session.get(
+        async with self.bot.web.get(
             f"http://ip-api.com/json/{ip}?fields=16969727"
         ) as resp:
             ip = await resp.json()
@@ -292,7 +264,7 @@ class Utilities(commands.Cog):
         if not match:
             raise commands.BadArgument("Invalid URL provided.")
         if match:
-            async with self.bot.session.get("https://clck.ru/--?url=" + match[0]) as f:
+            async with self.bot.web.get("https://clck.ru/--?url=" + match[0]) as f:
                 short = await f.text()
                 await ctx.send(
                     embed=ctx.embed(
@@ -321,7 +293,7 @@ class Utilities(commands.Cog):
             code = code[len(first_line) + 1 :]
         params = {"language": lang, "source": code, "log": 0}
         timeout = aiohttp.ClientTimeout(total=60)
-        async with self.bot.session.post(
+        async with self.bot.web.post(
             "https://emkc.org/api/v1/piston/execute", json=params, timeout=timeout
         ) as resp:
             res = await resp.json()
@@ -339,9 +311,7 @@ class Utilities(commands.Cog):
     @commands.command(aliases=["calc"])
     async def math(self, ctx, *, expr: str):
         params = {"expr": expr}
-        async with self.bot.session.get(
-            "https://api.mathjs.org/v4/", params=params
-        ) as f:
+        async with self.bot.web.get("https://api.mathjs.org/v4/", params=params) as f:
             result = await f.text()
         await ctx.send(f"```yaml\n{result}```")
 
@@ -353,7 +323,7 @@ class Utilities(commands.Cog):
 
         No arguments are needed for this command. I could put a user, but I feel like not everyone would be comfortable with that.
         """
-        tables = {"todos": None, "economy": None, "highlights": None}
+        tables = {"todos": None, "economy": None, "highlights": None, "afk": None}
         for table in tables:
             response = await self.bot.db.fetch(
                 f"SELECT * FROM {table} WHERE user_id = $1", ctx.author.id
@@ -32,9 +32,17 @@ CREATE TABLE IF NOT EXISTS economy (
     user_id BIGINT,
     cash BIGINT DEFAULT 100,
     bank BIGINT DEFAULT 100,
+    version BIGINT NOT NULL DEFAULT 0,
     PRIMARY KEY (guild_id, user_id)
 );
 
+-- bumped by every update, so the bot can tell which of two results is newer
+ALTER TABLE economy ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS economy_total_idx ON economy (guild_id, (cash + bank) DESC, user_id);
+CREATE INDEX IF NOT EXISTS economy_cash_idx ON economy (guild_id, cash DESC, user_id);
+CREATE INDEX IF NOT EXISTS economy_bank_idx ON economy (guild_id, bank DESC, user_id);
+
 CREATE TABLE IF NOT EXISTS stocks (
     guild_id BIGINT REFERENCES guilds ON DELETE CASCADE,
     user_id BIGINT,
@@ -61,4 +69,16 @@ CREATE TABLE IF NOT EXISTS highlights (
     user_id BIGINT,
     word VARCHAR (256),
     PRIMARY KEY (user_id, guild_id, word)
-)
+);
+
+CREATE TABLE IF NOT EXISTS afk (
+    user_id BIGINT PRIMARY KEY,
+    reason VARCHAR,
+    time TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS facts (
+    animal VARCHAR,
+    fact VARCHAR,
+    PRIMARY KEY (animal, fact)
+);
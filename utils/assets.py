@@ -0,0 +1,85 @@
+"""
+The templates and fonts in assets/, loaded once per process instead of once per image.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import functools
+import os
+import textwrap
+from io import BytesIO
+
+from PIL import Image, ImageFont
+
+PATH = "assets"
+TEMPLATES = ("black.jpeg", "ahb.jpeg", "bongocat.png")
+FONTS = ("Montserrat-Regular.ttf", "Montserrat-Bold.ttf", "Helvetica Bold.ttf")
+
+_templates = {}
+_fonts = {}
+
+
+def preload():
+    """
+    Loads every template and font.
+    The image workers are forked from the bot, so calling this before they start means they never load anything themselves.
+    """
+    for name in TEMPLATES:
+        _template(name)
+    for name in FONTS:
+        _font_file(name)
+
+
+def _template(name: str) -> Image.Image:
+    img = _templates.get(name)
+    if img is None:
+        img = Image.open(os.path.join(PATH, name))
+        img.load()
+        _templates[name] = img
+    return img
+
+
+def _font_file(name: str) -> bytes:
+    data = _fonts.get(name)
+    if data is None:
+        with open(os.path.join(PATH, name), "rb") as f:
+            data = _fonts[name] = f.read()
+    return data
+
+
+def template(name: str) -> Image.Image:
+    """A copy of a decoded template, to draw on without touching the original."""
+    return _template(name).copy()
+
+
+@functools.lru_cache(maxsize=32)
+def font(name: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(BytesIO(_font_file(name)), size)
+
+
+@functools.lru_cache(maxsize=256)
+def wrap(text: str, width: int) -> tuple:
+    return tuple(textwrap.wrap(text, width=width))
+
+
+@functools.lru_cache(maxsize=256)
+def layout(text: str, width: int, font_name: str, size: int) -> tuple:
+    """Wraps `text` to `width` characters, and measures each line as `(line, width, height)`."""
+    face = font(font_name, size)
+    lines = []
+    for line in wrap(text, width):
+        _, _, right, bottom = face.getbbox(line)
+        lines.append((line, right, bottom))
+    return tuple(lines)
@@ -0,0 +1,113 @@
+"""
+Downloading images from links people send, without trusting them to be small or even images.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import aiohttp
+from discord.ext import commands
+
+MAX_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 16
+
+# what servers that don't know better call images
+CONTENT_TYPES = ("image/", "application/octet-stream", "binary/octet-stream")
+
+
+class ImageTooLarge(commands.BadArgument):
+    def __init__(self, limit: int):
+        super().__init__(
+            f"That image is too large, the most I can download is {limit // 1024 // 1024} MB."
+        )
+
+
+def sniff(data: bytes):
+    """The image format going by the magic bytes at the start of `data`, or `None` if it isn't one we know."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:2] == b"BM":
+        return "bmp"
+    return None
+
+
+def _acceptable(resp) -> bool:
+    content_type = resp.headers.get("Content-Type", "")
+    return resp.status < 400 and (
+        not content_type or content_type.startswith(CONTENT_TYPES)
+    )
+
+
+async def download(session, url: str, *, limit: int = MAX_BYTES):
+    """
+    Downloads an image, or returns `None` if `url` doesn't point at one.
+    The body is streamed in, and given up on as soon as it goes past `limit` bytes
+    or its first bytes turn out not to be an image.
+    Raises `ImageTooLarge` if it's too big, before reading anything if the server says how big it is.
+    """
+    async with session.get(url) as resp:
+        if not _acceptable(resp):
+            return None
+        length = resp.content_length
+        if length is not None and length > limit:
+            raise ImageTooLarge(limit)
+
+        # servers can lie about the length, so the buffer is allowed to grow, but never past the limit
+        buffer = bytearray(length or CHUNK_SIZE)
+        size = 0
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            end = size + len(chunk)
+            if end > limit:
+                raise ImageTooLarge(limit)
+            if end > len(buffer):
+                grown = min(max(len(buffer) * 2, end), limit)
+                buffer.extend(bytes(grown - len(buffer)))
+            buffer[size:end] = chunk
+            if size < SNIFF_BYTES <= end and sniff(buffer[:SNIFF_BYTES]) is None:
+                return None
+            size = end
+
+    if not size or sniff(buffer[:SNIFF_BYTES]) is None:
+        return None
+    del buffer[size:]
+    return bytes(buffer)
+
+
+async def is_image(session, url: str) -> bool:
+    """
+    Checks that `url` points at an image without downloading it.
+    Asks with a HEAD request, and falls back to a GET for just the first few bytes
+    for servers that don't answer HEAD or don't say what they're sending.
+    """
+    try:
+        async with session.head(url, allow_redirects=True) as resp:
+            content_type = resp.headers.get("Content-Type", "")
+            if resp.status < 400 and content_type:
+                return content_type.startswith("image/")
+
+        headers = {"Range": f"bytes=0-{SNIFF_BYTES - 1}"}
+        async with session.get(url, headers=headers) as resp:
+            if resp.status >= 400:
+                return False
+            # servers that ignore Range send everything, only read what's needed
+            return sniff(await resp.content.read(SNIFF_BYTES)) is not None
+    except aiohttp.ClientError:
+        return False
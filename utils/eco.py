@@ -1,32 +1,367 @@
-from discord.ext import commands
+import asyncio
+import bisect
+
+from discord.ext import commands, tasks
+
+from utils.cache import LRUCache
+from utils.logger import create_logger
+
+logger = create_logger("Economy")
+
+FLUSH_INTERVAL = 0.5
+BALANCE_CACHE_SIZE = 10000
+
+COLUMNS = ("cash", "bank")
+
+# Each of these has a matching index in schema.sql
+LEADERBOARD_ORDERS = {
+    "total": "cash + bank",
+    "cash": "cash",
+    "bank": "bank",
+}
+
+# The locked CTE checks and row-locks every account first, so either all of the rows
+# are updated or none are.
+MOVE_QUERY = """
+    WITH v (user_id, cash, bank) AS (
+        VALUES {values}
+    ), locked AS (
+        SELECT economy.user_id FROM economy JOIN v ON economy.user_id = v.user_id
+        WHERE economy.guild_id = $1
+        AND economy.cash + v.cash >= 0 AND economy.bank + v.bank >= 0
+        ORDER BY economy.user_id
+        FOR UPDATE OF economy
+    )
+    UPDATE economy SET cash = economy.cash + v.cash, bank = economy.bank + v.bank,
+    version = economy.version + 1
+    FROM v
+    WHERE economy.guild_id = $1 AND economy.user_id = v.user_id
+    AND (SELECT COUNT(*) FROM locked) = {count}
+    RETURNING economy.user_id, economy.cash, economy.bank, economy.version
+    """
 
 
 class NotRegistered(commands.CommandError):
     pass
 
 
-async def get_stats(ctx, user_id: int, not_author=False):
-    values = (ctx.guild.id, user_id)
-    async with ctx.bot.db.acquire() as conn:
-        async with conn.transaction():
-            registered = await conn.fetchval(
-                "SELECT 1 FROM economy WHERE guild_id = $1 AND user_id = $2", *values
+class InsufficientFunds(commands.BadArgument):
+    pass
+
+
+class Ledger:
+    """
+    Write-behind buffer for cash payouts.
+    Deltas are grouped per (guild_id, user_id) and written in one statement every `FLUSH_INTERVAL` seconds.
+    """
+
+    query = """
+        UPDATE economy SET cash = economy.cash + d.amount, version = economy.version + 1
+        FROM UNNEST($1::BIGINT[], $2::BIGINT[], $3::BIGINT[]) AS d(guild_id, user_id, amount)
+        WHERE economy.guild_id = d.guild_id AND economy.user_id = d.user_id
+        RETURNING economy.guild_id, economy.user_id, economy.cash, economy.bank, economy.version
+        """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._pending = {}
+        self._inflight = {}
+        self._idle = None
+        self.flushes = 0
+
+    def start(self):
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.flush_loop.start()
+
+    async def close(self):
+        self.flush_loop.stop()
+        await self.wait()
+        await self.flush()
+
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def flush_loop(self):
+        await self.flush()
+
+    def add(self, guild_id: int, user_id: int, amount: int):
+        key = (guild_id, user_id)
+        self._pending[key] = self._pending.get(key, 0) + amount
+
+    def pending(self, guild_id: int, user_id: int) -> int:
+        """The amount that has been paid out but not written yet."""
+        key = (guild_id, user_id)
+        return self._pending.get(key, 0) + self._inflight.get(key, 0)
+
+    def in_flight(self, guild_id: int, user_id: int) -> bool:
+        """Whether the flush in progress is writing to this account."""
+        return (guild_id, user_id) in self._inflight
+
+    def discard(self, guild_id: int, user_id: int) -> int:
+        """Drops the buffered deltas, used when the balance gets overwritten."""
+        return self._pending.pop((guild_id, user_id), 0)
+
+    async def wait(self):
+        """Waits for the flush in progress (if any) to finish."""
+        if self._idle:
+            await self._idle.wait()
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        self._inflight, self._pending = self._pending, {}
+        self._idle.clear()
+        self.flushes += 1
+
+        guilds, users = zip(*self._inflight)
+        try:
+            rows = await self.bot.db.fetch(
+                self.query, guilds, users, list(self._inflight.values())
             )
-            if not registered:
-                if not_author:
-                    raise NotRegistered(
-                        "This user is not registered! Tell them to use the register command."
-                    )
+        except Exception as e:
+            logger.error("Could not flush %s ledger entries: %s", len(guilds), e)
+            for (guild_id, user_id), amount in self._inflight.items():
+                self.add(guild_id, user_id, amount)
+        else:
+            for row in rows:
+                cache_balance(self.bot, row["guild_id"], row["user_id"], row)
+        finally:
+            self._inflight = {}
+            self._idle.set()
+
+
+class BalanceCache(LRUCache):
+    """(cash, bank, version) as stored in the database, keyed by (guild_id, user_id)."""
+
+    def __init__(self, maxsize: int = BALANCE_CACHE_SIZE):
+        super().__init__(maxsize)
+
+    def forget_guild(self, guild_id: int):
+        for key in [key for key in self.keys() if key[0] == guild_id]:
+            self.pop(key)
+
+
+class Leaderboard:
+    """
+    Every account in a guild, kept sorted for each ordering that has been asked for.
+    Rankings hold `(-value, user_id)` keys, so the next page is whatever comes after the last key.
+    """
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.accounts = {}
+        self.rankings = {}
+        self.lock = asyncio.Lock()
+        self._touched = None
+
+    @staticmethod
+    def value(order: str, cash: int, bank: int) -> int:
+        if order == "cash":
+            return cash
+        if order == "bank":
+            return bank
+        return cash + bank
+
+    async def load(self, bot, order: str):
+        query = f"""
+            SELECT user_id, cash, bank FROM economy WHERE guild_id = $1
+            ORDER BY {LEADERBOARD_ORDERS[order]} DESC, user_id
+            """
+        # writes that land while the query runs are newer than its rows
+        self._touched = set()
+        try:
+            rows = await bot.db.fetch(query, self.guild_id)
+        finally:
+            touched, self._touched = self._touched, None
+
+        found = set()
+        for row in rows:
+            user_id = row["user_id"]
+            found.add(user_id)
+            if user_id in touched:
+                continue
+            balance = (row["cash"], row["bank"])
+            if self.accounts.get(user_id) != balance:
+                self.update(user_id, *balance)
+        for user_id in set(self.accounts) - found - touched:
+            self.remove(user_id)
+
+        # already in index order unless something was touched, so this is cheap
+        self.rankings[order] = sorted(
+            (-self.value(order, cash, bank), user_id)
+            for user_id, (cash, bank) in self.accounts.items()
+        )
+
+    def update(self, user_id: int, cash: int, bank: int):
+        self.remove(user_id)
+        self.accounts[user_id] = (cash, bank)
+        for order, ranking in self.rankings.items():
+            bisect.insort(ranking, (-self.value(order, cash, bank), user_id))
+        if self._touched is not None:
+            self._touched.add(user_id)
+
+    def remove(self, user_id: int):
+        old = self.accounts.pop(user_id, None)
+        if self._touched is not None:
+            self._touched.add(user_id)
+        if old is None:
+            return
+        for order, ranking in self.rankings.items():
+            key = (-self.value(order, *old), user_id)
+            index = bisect.bisect_left(ranking, key)
+            if index < len(ranking) and ranking[index] == key:
+                del ranking[index]
+
+    def count(self, order: str) -> int:
+        """The total leaderboard lists everyone, cash and bank only list people with money."""
+        ranking = self.rankings[order]
+        if order == "total":
+            return len(ranking)
+        return bisect.bisect_left(ranking, (0,))
+
+    def key_at(self, order: str, index: int):
+        ranking = self.rankings[order]
+        if not ranking:
+            return None
+        return ranking[min(index, len(ranking) - 1)]
+
+    def page(self, order: str, after=None, limit: int = 10):
+        """Returns up to `limit` (rank, user_id, value) entries that come after the `after` key."""
+        ranking = self.rankings[order]
+        start = bisect.bisect_right(ranking, after) if after else 0
+        end = min(start + limit, self.count(order))
+        return [
+            (rank, user_id, -value)
+            for rank, (value, user_id) in enumerate(ranking[start:end], start=start + 1)
+        ]
+
+
+async def get_leaderboard(bot, guild_id: int, order: str = "total") -> Leaderboard:
+    board = bot.leaderboards.get(guild_id)
+    if board is None:
+        board = bot.leaderboards[guild_id] = Leaderboard(guild_id)
+    async with board.lock:
+        if order not in board.rankings:
+            await board.load(bot, order)
+    return board
+
+
+def cache_balance(bot, guild_id: int, user_id: int, record):
+    """
+    Stores a `cash, bank, version` record returned by a write. `None` means the row is gone.
+    Writes on different connections can come back in any order, so a record older than the cached one is ignored.
+    """
+    key = (guild_id, user_id)
+    board = bot.leaderboards.get(guild_id)
+    if record is None:
+        bot.balances.pop(key)
+        if board:
+            board.remove(user_id)
+        return
+
+    cached = bot.balances.peek(key)
+    if cached is not None and cached[2] >= record["version"]:
+        return
+    bot.balances[key] = (record["cash"], record["bank"], record["version"])
+    if board:
+        board.update(user_id, record["cash"], record["bank"])
+
+
+async def get_stats(ctx, user_id: int, not_author=False):
+    key = (ctx.guild.id, user_id)
+    if ctx.bot.ledger.in_flight(*key):
+        # a write that waited on the flush already includes what it's writing,
+        # which pending() counts until the flush is done
+        await ctx.bot.ledger.wait()
+    data = ctx.bot.balances.get(key)
+    while data is None:
+        ledger = ctx.bot.ledger
+        await ledger.wait()
+        flushes = ledger.flushes
+        record = await ctx.bot.db.fetchrow(
+            "SELECT cash, bank, version FROM economy WHERE guild_id = $1 AND user_id = $2",
+            *key,
+        )
+        if not record:
+            if not_author:
                 raise NotRegistered(
-                    "You are not registered! Use the register command to set up an account at the bank."
+                    "This user is not registered! Tell them to use the register command."
                 )
+            raise NotRegistered(
+                "You are not registered! Use the register command to set up an account at the bank."
+            )
 
-            data = await conn.fetchrow(
-                "SELECT cash, bank FROM economy WHERE guild_id = $1 AND user_id = $2",
-                *values
+        # a write that finished while we were reading is newer than this read
+        data = ctx.bot.balances.peek(key)
+        if data is None and ledger.flushes == flushes:
+            data = ctx.bot.balances[key] = (
+                record["cash"],
+                record["bank"],
+                record["version"],
             )
+        # otherwise a flush started during the read, and the read may or may not
+        # include what it wrote while pending() still counts it, so read again
+
+    cash, bank, _ = data
+    return cash + ctx.bot.ledger.pending(*key), bank
+
+
+async def move(
+    bot,
+    guild_id: int,
+    src: int,
+    dst: int,
+    amount: int,
+    from_col: str = "cash",
+    to_col: str = "cash",
+):
+    """
+    Moves `amount` from `src`'s `from_col` to `dst`'s `to_col` in one statement.
+    `src` and `dst` can be the same user, which is how deposits and withdrawals work.
+
+    Returns a dict of user_id -> (cash, bank) with the new balances.
+    Raises InsufficientFunds if `src` does not have enough, in which case nothing is changed.
+    """
+    if from_col not in COLUMNS or to_col not in COLUMNS:
+        raise ValueError(f"Can only move money between {COLUMNS}")
+
+    # pending payouts are written by this statement instead of the ledger
+    await bot.ledger.wait()
+    deltas = {}
+    for user_id in (src, dst):
+        if user_id not in deltas:
+            deltas[user_id] = {"cash": bot.ledger.discard(guild_id, user_id), "bank": 0}
+    pending = {user_id: delta["cash"] for user_id, delta in deltas.items()}
+
+    deltas[src][from_col] -= amount
+    deltas[dst][to_col] += amount
+
+    args = [guild_id]
+    values = []
+    for user_id, delta in deltas.items():
+        n = len(args)
+        values.append(f"(${n + 1}::BIGINT, ${n + 2}::BIGINT, ${n + 3}::BIGINT)")
+        args.extend((user_id, delta["cash"], delta["bank"]))
+    query = MOVE_QUERY.format(values=", ".join(values), count=len(deltas))
+
+    rows = []
+    try:
+        rows = await bot.db.fetch(query, *args)
+    finally:
+        if len(rows) != len(deltas):
+            # nothing was written, so the payouts go back to the ledger
+            for user_id, cash in pending.items():
+                if cash:
+                    bot.ledger.add(guild_id, user_id, cash)
+
+    if len(rows) != len(deltas):
+        raise InsufficientFunds("That's more money than you have.")
 
-    return data["cash"], data["bank"]
+    balances = {}
+    for row in rows:
+        cache_balance(bot, guild_id, row["user_id"], row)
+        balances[row["user_id"]] = (row["cash"], row["bank"])
+    return balances
 
 
 def get_number(number: str, total: int):
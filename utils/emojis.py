@@ -0,0 +1,144 @@
+"""
+Index of the emojis the bot can see, for fast fuzzy searching.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import collections
+import functools
+import heapq
+import itertools
+import re
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_query(text: str) -> re.Pattern:
+    """The same pattern `utils.fuzzy.finder` builds, but only compiled once per query."""
+    return re.compile(".*?".join(map(re.escape, text)), flags=re.IGNORECASE)
+
+
+def pairs(name: str) -> set:
+    """Every ordered pair of characters in a name, `abc` has `ab`, `ac` and `bc`."""
+    return {a + b for a, b in itertools.combinations(name, 2)}
+
+
+class EmojiIndex:
+    """
+    Emojis by name, plus every emoji under each ordered pair of characters in its name.
+    A query only matches a name that has all of the query's consecutive pairs,
+    so only those candidates get checked against the pattern.
+    Results are ranked exactly like `utils.fuzzy.finder` would rank `bot.emojis`.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.names = collections.defaultdict(list)
+        self._emojis = {}
+        self._guilds = collections.defaultdict(dict)
+        self._chars = collections.defaultdict(set)
+        self._pairs = collections.defaultdict(set)
+        self._order = itertools.count()
+
+    def rebuild(self, emojis):
+        """Throws everything away and indexes `emojis`, in the order of `bot.emojis`."""
+        self.clear()
+        for emoji in emojis:
+            self.add(emoji)
+
+    def add_guild(self, guild):
+        for emoji in guild.emojis:
+            self.add(emoji)
+
+    def remove_guild(self, guild_id: int):
+        for emoji_id in list(self._guilds.get(guild_id, ())):
+            self.remove(emoji_id)
+
+    def update_guild(self, guild):
+        # discord.py stores a guild's new emojis after everything else, so do the same
+        self.remove_guild(guild.id)
+        self.add_guild(guild)
+
+    def add(self, emoji):
+        self.remove(emoji.id)
+        name = emoji.name.lower()
+        self._emojis[emoji.id] = (next(self._order), emoji, name)
+        self._guilds[emoji.guild_id][emoji.id] = emoji
+        self.names[name].append(emoji)
+        for char in set(name):
+            self._chars[char].add(emoji.id)
+        for pair in pairs(name):
+            self._pairs[pair].add(emoji.id)
+
+    def remove(self, emoji_id: int):
+        entry = self._emojis.pop(emoji_id, None)
+        if entry is None:
+            return
+        _, emoji, name = entry
+        guild = self._guilds[emoji.guild_id]
+        del guild[emoji_id]
+        if not guild:
+            del self._guilds[emoji.guild_id]
+        same_name = self.names[name]
+        same_name.remove(emoji)
+        if not same_name:
+            del self.names[name]
+        for index, keys in ((self._chars, set(name)), (self._pairs, pairs(name))):
+            for key in keys:
+                ids = index[key]
+                ids.discard(emoji_id)
+                if not ids:
+                    del index[key]
+
+    def candidates(self, text: str):
+        """Ids of the emojis that could match, a superset of what `finder` would find."""
+        text = text.lower()
+        if not text:
+            return self._emojis.keys()
+        if len(text) == 1:
+            return self._chars.get(text, ())
+        postings = []
+        for pair in {a + b for a, b in zip(text, text[1:])}:
+            ids = self._pairs.get(pair)
+            if not ids:
+                return ()
+            postings.append(ids)
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def search(self, text, *, limit: int = None) -> list:
+        """
+        Same as `finder(text, bot.emojis, key=lambda e: e.name, lazy=False)`.
+        With a `limit`, only that many of the best matches are returned.
+        """
+        text = str(text)
+        regex = compile_query(text)
+        entries = sorted(self._emojis[emoji_id] for emoji_id in self.candidates(text))
+        suggestions = []
+        for _, emoji, _ in entries:
+            match = regex.search(emoji.name)
+            if match:
+                suggestions.append(
+                    (len(match.group()), match.start(), emoji.name, emoji)
+                )
+        if limit is None:
+            suggestions.sort(key=lambda tup: tup[:3])
+        else:
+            suggestions = heapq.nsmallest(limit, suggestions, key=lambda tup: tup[:3])
+        return [emoji for *_, emoji in suggestions]
+
+    def __len__(self):
+        return len(self._emojis)
@@ -0,0 +1,121 @@
+"""
+Where the animal facts the bot has seen are kept.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+from jishaku.functools import executor_function
+
+from utils import create_logger
+
+logger = create_logger("Facts")
+
+WRITE_DELAY = 20
+
+
+@executor_function
+def write_atomic(path: str, data: str):
+    """Writes to a temporary file next to `path` and renames it over `path`, so a crash can't leave half a file."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".facts-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class JSONFacts:
+    """
+    Facts kept in a JSON file, read once and written back only when something was added.
+    Everything added within `delay` seconds of the first change goes out in one write.
+    """
+
+    def __init__(self, path: str = "assets/facts.json", delay: float = WRITE_DELAY):
+        self.path = path
+        self.delay = delay
+        self.dirty = False
+        self.writes = 0
+        self._write = None
+        with open(path) as f:
+            self.facts = {
+                key: dict.fromkeys(facts) for key, facts in json.load(f).items()
+            }
+
+    async def add(self, animal: str, fact: str) -> bool:
+        """Remembers a fact, returning whether it was new."""
+        facts = self.facts.setdefault(f"{animal}_facts", {})
+        if fact in facts:
+            return False
+        facts[fact] = None
+        self.dirty = True
+        if self._write is None:
+            self._write = asyncio.ensure_future(self._write_later())
+        return True
+
+    async def _write_later(self):
+        await asyncio.sleep(self.delay)
+        self._write = None
+        await self.flush()
+
+    async def flush(self):
+        """Writes the file now if anything changed since the last write."""
+        if not self.dirty:
+            return
+        # cleared before the write, so facts added during it get a write of their own
+        self.dirty = False
+        data = json.dumps(
+            {key: list(facts) for key, facts in self.facts.items()}, indent=4
+        )
+        try:
+            await write_atomic(self.path, data)
+        except OSError as e:
+            self.dirty = True
+            logger.error("Could not write %s: %s", self.path, e)
+        else:
+            self.writes += 1
+
+    async def close(self):
+        if self._write is not None:
+            self._write.cancel()
+            self._write = None
+        await self.flush()
+
+
+class PostgresFacts:
+    """Facts kept in the facts table, one row each, so nothing has to be loaded up front."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def add(self, animal: str, fact: str) -> bool:
+        status = await self.db.execute(
+            "INSERT INTO facts (animal, fact) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+            animal,
+            fact,
+        )
+        return status == "INSERT 0 1"
+
+    async def close(self):
+        pass
@@ -0,0 +1,279 @@
+"""
+The HTTP client commands use to talk to other APIs, so one slow API can't hold everything else up.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import bisect
+import collections
+import random
+import time
+
+import aiohttp
+import yarl
+from discord.ext import commands
+
+from utils import create_logger
+
+logger = create_logger("HTTP")
+
+MAX_CONNECTIONS = 100
+MAX_PER_HOST = 10
+TIMEOUT = aiohttp.ClientTimeout(total=20, sock_connect=5)
+RETRIES = 2
+BACKOFF = 0.5
+IDEMPOTENT = frozenset(("GET", "HEAD"))
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+
+FAILURE_THRESHOLD = 5
+COOLDOWN = 30
+
+# upper bounds of the latency buckets, in milliseconds
+BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class CircuitOpen(commands.CommandError):
+    """Raised instead of making a request to a host that has been failing."""
+
+    def __init__(self, host: str):
+        self.host = host
+        super().__init__(
+            f"`{host}` isn't responding right now, please try again in a bit."
+        )
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host once `threshold` of them in a row have failed.
+    After `cooldown` seconds one request is let through to try it again, and if that works the host is back.
+    """
+
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, cooldown: float = COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self.trial_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.trial_at is not None else "open"
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown:
+            return False
+        # a trial that never reported back doesn't block the host forever
+        if self.trial_at is not None and now - self.trial_at < self.cooldown:
+            return False
+        self.trial_at = now
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_at = None
+
+    def failure(self) -> bool:
+        """Counts a failure, returning whether it tripped the breaker."""
+        self.failures += 1
+        if self.trial_at is None and (
+            self.opened_at is not None or self.failures < self.threshold
+        ):
+            return False
+        tripped = self.opened_at is None
+        if tripped:
+            self.trips += 1
+        self.opened_at = time.monotonic()
+        self.trial_at = None
+        return tripped
+
+
+class HostStats:
+    """A latency histogram and error counts for one host."""
+
+    __slots__ = ("requests", "buckets", "errors", "total")
+
+    def __init__(self):
+        self.requests = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.errors = collections.Counter()
+        self.total = 0.0
+
+    def record(self, elapsed: float, error: str = None):
+        ms = elapsed * 1000
+        self.requests += 1
+        self.total += ms
+        self.buckets[bisect.bisect_left(BUCKETS, ms)] += 1
+        if error is not None:
+            self.errors[error] += 1
+
+    def percentile(self, fraction: float) -> str:
+        """Which bucket the `fraction` percentile falls in, as its upper bound."""
+        target = self.requests * fraction
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return f"≤{bound} ms"
+        return f">{BUCKETS[-1]} ms"
+
+
+class _Request:
+    """What `HTTPClient.get` and friends return, usable with `async with` like aiohttp's, or just awaited."""
+
+    __slots__ = ("client", "method", "url", "kwargs", "resp")
+
+    def __init__(self, client, method, url, kwargs):
+        self.client = client
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self.resp = None
+
+    def __await__(self):
+        return self.client.request(self.method, self.url, **self.kwargs).__await__()
+
+    async def __aenter__(self):
+        self.resp = await self.client.request(self.method, self.url, **self.kwargs)
+        return self.resp
+
+    async def __aexit__(self, *exc):
+        self.resp.release()
+
+
+class HTTPClient:
+    """
+    An aiohttp session with limits on connections per host, default timeouts,
+    retries with jittered backoff for GET and HEAD, and a circuit breaker per host.
+    Keeps a latency histogram and error counts per host.
+    """
+
+    def __init__(
+        self,
+        *,
+        per_host: int = MAX_PER_HOST,
+        timeout: aiohttp.ClientTimeout = TIMEOUT,
+        retries: int = RETRIES,
+        backoff: float = BACKOFF,
+    ):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=MAX_CONNECTIONS, limit_per_host=per_host
+            ),
+            timeout=timeout,
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.breakers = collections.defaultdict(CircuitBreaker)
+        self.hosts = collections.defaultdict(HostStats)
+
+    def get(self, url, **kwargs) -> _Request:
+        return _Request(self, "GET", url, kwargs)
+
+    def head(self, url, **kwargs) -> _Request:
+        kwargs.setdefault("allow_redirects", False)
+        return _Request(self, "HEAD", url, kwargs)
+
+    def post(self, url, **kwargs) -> _Request:
+        return _Request(self, "POST", url, kwargs)
+
+    async def request(self, method: str, url, **kwargs) -> aiohttp.ClientResponse:
+        """
+        Makes a request, retrying GETs and HEADs that failed to connect, timed out
+        or got a 429 or 502-504, waiting a random, growing amount of time in between.
+        Raises `CircuitOpen` without making the request if the host has been failing.
+        """
+        host = yarl.URL(str(url)).host
+        breaker = self.breakers[host]
+        stats = self.hosts[host]
+        attempts = self.retries + 1 if method in IDEMPOTENT else 1
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                raise CircuitOpen(host)
+            last = attempt == attempts - 1
+            start = time.perf_counter()
+            try:
+                resp = await self.session.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                stats.record(time.perf_counter() - start, type(e).__name__)
+                self._failed(host, breaker)
+                if last:
+                    raise
+            else:
+                elapsed = time.perf_counter() - start
+                if resp.status < 500 and resp.status != 429:
+                    stats.record(elapsed)
+                    breaker.success()
+                    return resp
+                stats.record(elapsed, str(resp.status))
+                if resp.status >= 500:
+                    self._failed(host, breaker)
+                if last or resp.status not in RETRY_STATUSES:
+                    return resp
+                resp.release()
+            await asyncio.sleep(random.uniform(0, self.backoff * 2**attempt))
+
+    @staticmethod
+    def _failed(host: str, breaker: CircuitBreaker):
+        if breaker.failure():
+            logger.warning(
+                "%s failed %s times in a row, pausing requests to it",
+                host,
+                breaker.failures,
+            )
+
+    def stats(self) -> list:
+        """A row per host, for tabulate."""
+        rows = []
+        for host, stats in sorted(
+            self.hosts.items(), key=lambda item: item[1].requests, reverse=True
+        ):
+            errors = ", ".join(
+                f"{error} {count}" for error, count in stats.errors.most_common(3)
+            )
+            rows.append(
+                {
+                    "host": host,
+                    "requests": stats.requests,
+                    "avg": f"{stats.total / (stats.requests or 1):.0f} ms",
+                    "p50": stats.percentile(0.5),
+                    "p95": stats.percentile(0.95),
+                    "errors": errors or "none",
+                    "circuit": self.breakers[host].state,
+                }
+            )
+        return rows
+
+    def histogram(self, host: str) -> list:
+        """The latency histogram of one host, a row per bucket."""
+        stats = self.hosts.get(host)
+        if stats is None:
+            return []
+        bounds = [f"≤{bound} ms" for bound in BUCKETS] + [f">{BUCKETS[-1]} ms"]
+        return [
+            {"latency": bound, "requests": count}
+            for bound, count in zip(bounds, stats.buckets)
+        ]
+
+    async def close(self):
+        await self.session.close()
@@ -0,0 +1,166 @@
+"""
+Cache for the images that image commands download.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import collections
+import hashlib
+import os
+import shutil
+
+from jishaku.functools import executor_function
+
+from utils import create_logger
+from utils.cache import Coalescer, LRUCache
+
+logger = create_logger("ImageCache")
+
+MEMORY_BUDGET = 64 * 1024 * 1024
+DISK_BUDGET = 512 * 1024 * 1024
+MAX_KEYS = 10000
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@executor_function
+def write_file(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@executor_function
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class ImageCache:
+    """
+    Image bytes, found by what they were fetched from and then by a hash of their content.
+    Keys are things like `("avatar", url)`, `("emoji", id)` or `("url", url)`,
+    so the same avatar reached two different ways is only stored once.
+    The least recently used images are moved to disk once `memory_budget` bytes are in memory,
+    and deleted once `disk_budget` bytes are on disk.
+    """
+
+    def __init__(
+        self,
+        path: str = "cache/images",
+        memory_budget: int = MEMORY_BUDGET,
+        disk_budget: int = DISK_BUDGET,
+    ):
+        self.path = path
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.hits = 0
+        self.misses = 0
+        self.keys = LRUCache(maxsize=MAX_KEYS)
+        self.memory = collections.OrderedDict()
+        self.memory_size = 0
+        self.disk = collections.OrderedDict()
+        self.disk_size = 0
+        self._inflight = Coalescer()
+
+        # nothing on disk can be found again without the keys, which only live in memory
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+    def __contains__(self, key):
+        digest = self.keys.peek(key)
+        return digest is not None and (digest in self.memory or digest in self.disk)
+
+    def __len__(self):
+        return len(self.memory) + len(self.disk)
+
+    async def get(self, key, fetch):
+        """
+        Gets the image stored under `key`, or awaits `fetch()` for it.
+        Everyone asking for the same key at once shares one fetch.
+        `fetch` returning nothing means there's no image, which isn't cached.
+        """
+        digest = self.keys.get(key)
+        if digest is not None:
+            data = await self._load(digest)
+            if data is not None:
+                self.hits += 1
+                return data
+        self.misses += 1
+        return await self._inflight.run(key, lambda: self._fetch(key, fetch))
+
+    async def _fetch(self, key, fetch):
+        data = await fetch()
+        if data:
+            await self.put(key, data)
+        return data
+
+    async def put(self, key, data: bytes) -> str:
+        """Stores an image under `key` and returns the hash of its content."""
+        digest = content_hash(data)
+        self.keys[key] = digest
+        if digest in self.memory:
+            self.memory.move_to_end(digest)
+        elif len(data) <= self.memory_budget:
+            self.memory[digest] = data
+            self.memory_size += len(data)
+            await self._spill()
+        return digest
+
+    async def _load(self, digest: str):
+        data = self.memory.get(digest)
+        if data is not None:
+            self.memory.move_to_end(digest)
+            return data
+        if digest not in self.disk:
+            return None
+        try:
+            data = await read_file(os.path.join(self.path, digest))
+        except OSError:
+            self._forget_file(digest)
+            return None
+        self.disk.move_to_end(digest)
+        if digest not in self.memory:
+            self.memory[digest] = data
+            self.memory_size += len(data)
+            await self._spill()
+        return data
+
+    async def _spill(self):
+        """Moves the least recently used images to disk until memory is back under budget."""
+        while self.memory_size > self.memory_budget:
+            digest, data = self.memory.popitem(last=False)
+            self.memory_size -= len(data)
+            if digest in self.disk or len(data) > self.disk_budget:
+                continue
+            try:
+                await write_file(os.path.join(self.path, digest), data)
+            except OSError as e:
+                logger.error("Could not write %s to disk: %s", digest, e)
+                continue
+            self.disk[digest] = len(data)
+            self.disk_size += len(data)
+
+        while self.disk_size > self.disk_budget:
+            digest = next(iter(self.disk))
+            self._forget_file(digest)
+            try:
+                os.remove(os.path.join(self.path, digest))
+            except OSError:
+                pass
+
+    def _forget_file(self, digest: str):
+        self.disk_size -= self.disk.pop(digest, 0)
@@ -0,0 +1,66 @@
+"""
+Compiled command prefixes.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+def compile_prefixes(user_id: int, prefixes) -> tuple:
+    """
+    Builds the tuple of everything the bot answers to, mentions included.
+    Longest prefixes come first so that `p!!` wins over `p!` when both are set.
+    """
+    compiled = [f"<@{user_id}> ", f"<@!{user_id}> "]
+    compiled.extend(prefixes)
+    return tuple(sorted(dict.fromkeys(compiled), key=len, reverse=True))
+
+
+class PrefixMatcher:
+    """
+    Keeps one compiled prefix tuple per guild, so looking up a prefix doesn't build anything.
+    Has to be invalidated whenever `bot.prefixes` changes for a guild.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._compiled = {}
+        self._mentions = None
+
+    @property
+    def mentions(self) -> tuple:
+        """Both forms of the bot's mention, without the space after them."""
+        if self._mentions is None:
+            user_id = self.bot.user.id
+            self._mentions = (f"<@{user_id}>", f"<@!{user_id}>")
+        return self._mentions
+
+    def get(self, guild_id) -> tuple:
+        """Gets the prefixes for a guild, `None` being DMs."""
+        compiled = self._compiled.get(guild_id)
+        if compiled is None:
+            prefixes = self.bot.prefixes.get(guild_id) or (self.bot.default_prefix,)
+            compiled = compile_prefixes(self.bot.user.id, prefixes)
+            self._compiled[guild_id] = compiled
+        return compiled
+
+    def invalidate(self, guild_id=None):
+        """Forgets the compiled prefixes of a guild, or every guild if none is given."""
+        if guild_id is None:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(guild_id, None)
+
+    def __len__(self):
+        return len(self._compiled)
@@ -0,0 +1,256 @@
+"""
+Image rendering that runs in the image worker processes.
+Everything here takes and returns plain data so it can be sent between processes.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from io import BytesIO
+from typing import NamedTuple
+
+import polaroid
+from PIL import Image, ImageDraw, ImageSequence
+
+from utils import assets
+
+OUTPUT_BUDGET = 2 * 1024 * 1024
+# animations get more room, but stay well under Discord's 8 MB upload limit
+GIF_BUDGET = 6 * 1024 * 1024
+MAX_DOWNSCALES = 3
+FLAT_COLOURS = 256
+MAX_INPUT_PIXELS = 4_000_000
+
+
+class Encoded(NamedTuple):
+    """A finished image, what format it ended up as, and how big it would have been as a PNG."""
+
+    data: bytes
+    format: str
+    original: int
+
+
+class TooLarge(Exception):
+    """Raised when an animated image has more frames or pixels than we're willing to work on."""
+
+
+def is_animated(data: bytes) -> bool:
+    """Cheap check of the header, if this says yes `split_frames` will know for sure."""
+    if data[:4] == b"GIF8":
+        return True
+    # animated WebPs have the animation flag set in their VP8X chunk
+    return (
+        data[:4] == b"RIFF"
+        and data[8:16] == b"WEBPVP8X"
+        and len(data) > 20
+        and bool(data[20] & 0x02)
+    )
+
+
+def split_frames(data: bytes, max_frames: int, max_pixels: int):
+    """
+    Splits an animated GIF or WebP into PNG frames, along with how long each frame is shown and the loop count.
+    Returns `None` if the image only has one frame.
+    """
+    img = Image.open(BytesIO(data))
+    frames = getattr(img, "n_frames", 1)
+    if frames < 2:
+        return None
+    if frames > max_frames:
+        raise TooLarge(
+            f"That image has {frames} frames, the most I can do is {max_frames}."
+        )
+    if frames * img.width * img.height > max_pixels:
+        raise TooLarge("That image is too large to animate, try a smaller one.")
+
+    pngs = []
+    durations = []
+    for frame in ImageSequence.Iterator(img):
+        durations.append(frame.info.get("duration", 100))
+        byte = BytesIO()
+        frame.convert("RGBA").save(byte, "PNG", compress_level=1)
+        pngs.append(byte.getvalue())
+    return pngs, durations, img.info.get("loop", 0)
+
+
+def _save_gif(images, durations, loop: int) -> bytes:
+    return _save(
+        images[0],
+        "GIF",
+        save_all=True,
+        append_images=images[1:],
+        duration=durations,
+        loop=loop,
+        disposal=2,
+    )
+
+
+def join_frames(frames, durations, loop: int, budget: int = GIF_BUDGET) -> Encoded:
+    """
+    Puts PNG frames back together into a GIF.
+    If that comes out over `budget` bytes, every other frame is dropped and the frames are scaled down until it fits.
+    """
+    images = [Image.open(BytesIO(frame)) for frame in frames]
+    data = _save_gif(images, durations, loop)
+    original = len(data)
+    for _ in range(MAX_DOWNSCALES):
+        if len(data) <= budget:
+            break
+        ratio = budget / len(data)
+        if ratio < 0.5 and len(images) > 2:
+            # half the frames is about half the size, and keeps the rest sharper
+            images = images[::2]
+            durations = [
+                first + second
+                for first, second in zip(durations[::2], durations[1::2] + [0])
+            ]
+            ratio *= 2
+        if ratio < 1:
+            scale = ratio**0.5 * 0.9
+            size = (
+                max(1, int(images[0].width * scale)),
+                max(1, int(images[0].height * scale)),
+            )
+            images = [img.resize(size, Image.LANCZOS) for img in images]
+        data = _save_gif(images, durations, loop)
+    return Encoded(data, "gif", original)
+
+
+def extension(data: bytes) -> str:
+    """The file extension for image bytes, going by their magic bytes."""
+    if data[:4] == b"GIF8":
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    return "png"
+
+
+def _save(img: Image.Image, format: str, **options) -> bytes:
+    byte = BytesIO()
+    img.save(byte, format, **options)
+    return byte.getvalue()
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    if img.mode not in ("RGBA", "LA", "PA"):
+        return "transparency" in img.info
+    return img.getchannel("A").getextrema()[0] < 255
+
+
+def _lossy(img: Image.Image):
+    # JPEG can't do transparency, WebP can
+    if _has_alpha(img):
+        yield "webp", _save(img.convert("RGBA"), "WEBP", quality=80, method=4)
+        return
+    img = img.convert("RGB")
+    yield "webp", _save(img, "WEBP", quality=80, method=4)
+    yield "jpeg", _save(img, "JPEG", quality=85, optimize=True, progressive=True)
+
+
+def encode(img: Image.Image, budget: int = OUTPUT_BUDGET, png: bytes = None) -> Encoded:
+    """
+    Encodes a finished image to whatever makes sense for it.
+    Flat images with few colours, like text and memes, stay PNG so they stay sharp.
+    Anything else goes as whichever of PNG, WebP or JPEG is smallest,
+    and is scaled down until it fits in `budget` bytes.
+    `png` is the image already encoded as PNG, if there is one.
+    """
+    if png is None:
+        png = _save(img, "PNG")
+    original = len(png)
+    if original <= budget and img.getcolors(FLAT_COLOURS) is not None:
+        return Encoded(png, "png", original)
+
+    candidates = [("png", png)]
+    for attempt in range(MAX_DOWNSCALES + 1):
+        candidates.extend(_lossy(img))
+        format, data = min(candidates, key=lambda candidate: len(candidate[1]))
+        if len(data) <= budget or attempt == MAX_DOWNSCALES:
+            break
+        # size goes roughly with area, so scale both sides by the square root
+        scale = (budget / len(data)) ** 0.5 * 0.9
+        img = img.resize(
+            (max(1, int(img.width * scale)), max(1, int(img.height * scale))),
+            Image.LANCZOS,
+        )
+        candidates = []
+    return Encoded(data, format, original)
+
+
+def shrink(data: bytes, max_pixels: int = MAX_INPUT_PIXELS) -> bytes:
+    """
+    Scales huge images down to about `max_pixels` before anything works on them.
+    Only the header is read to find out, and JPEGs are scaled down while they're decoded.
+    """
+    img = Image.open(BytesIO(data))
+    if img.width * img.height <= max_pixels:
+        return data
+    scale = (max_pixels / (img.width * img.height)) ** 0.5
+    size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+    img.draft("RGB", size)
+    img.thumbnail(size, Image.LANCZOS)
+    if img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+        img = img.convert("RGBA")
+    return _save(img, "PNG", compress_level=1)
+
+
+def _polaroid(img: bytes, steps) -> bytes:
+    img = polaroid.Image(img)
+    for method, args in steps:
+        getattr(img, method)(*args)
+    return img.save_bytes()
+
+
+def do_polaroid(img: bytes, steps) -> Encoded:
+    """
+    Runs polaroid's image methods on `img` one after another, `steps` being `(method, args)` pairs.
+    The image is only decoded once and encoded once at the end, however many steps there are.
+    Huge images are scaled down first.
+    """
+    png = _polaroid(shrink(img), steps)
+    return encode(Image.open(BytesIO(png)), png=png)
+
+
+def do_polaroid_frames(frames, steps, max_frame_pixels: int) -> list:
+    """
+    Runs the steps on each frame of an animated image, the frames staying PNG.
+    Steps like `resize` can make frames a lot bigger than they came in,
+    so frames over `max_frame_pixels` are scaled back down before they're sent back.
+    """
+    return [shrink(_polaroid(frame, steps), max_frame_pixels) for frame in frames]
+
+
+def typerace(text: str) -> Encoded:
+    img = assets.template("black.jpeg")
+    draw = ImageDraw.Draw(img)
+    font = assets.font("Montserrat-Regular.ttf", 125)
+    wrapped = assets.wrap(text, 24)
+    draw.text((40, 40), "\n".join(wrapped), (255, 255, 255), font=font)
+    return encode(img)
+
+
+def always_has_been(text: str) -> Encoded:
+    img = assets.template("ahb.jpeg")
+
+    draw = ImageDraw.Draw(img)
+    font = assets.font("Helvetica Bold.ttf", 17)
+
+    down = 90
+    for line, width, height in assets.layout(text, 20, "Helvetica Bold.ttf", 17):
+        draw.text(((img.width - width) / 2, down), line, font=font)
+        down += height + 10
+
+    return encode(img)
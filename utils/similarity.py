@@ -0,0 +1,74 @@
+"""
+String similarity, used for "did you mean" suggestions and the fuzzy command.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import heapq
+
+
+def _masks(text: str) -> dict:
+    """Bit `i` of `masks[char]` is set when `text[i]` is `char`."""
+    masks = {}
+    for i, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | 1 << i
+    return masks
+
+
+def _lcs(masks: dict, length: int, other: str) -> int:
+    # Hyyrö's bit-parallel LCS, one row of the DP table per character of `other`
+    full = (1 << length) - 1
+    row = full
+    for char in other:
+        matches = row & masks.get(char, 0)
+        row = ((row + matches) | (row - matches)) & full
+    return length - bin(row).count("1")
+
+
+def lcs_length(a: str, b: str) -> int:
+    """Length of the longest common subsequence of two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    return _lcs(_masks(b), len(b), a)
+
+
+def ratio(a: str, b: str) -> float:
+    """
+    How similar two strings are, from 0 to 1.
+    This is an edit distance where substitutions cost 2 and insertions or deletions cost 1,
+    which works out to twice the longest common subsequence over the total length.
+    """
+    total = len(a) + len(b)
+    if not total:
+        return 1.0
+    distance = total - 2 * lcs_length(a, b)
+    return (total - distance) / total
+
+
+def extract(query: str, choices, *, limit: int = None, cutoff: float = 0.0) -> list:
+    """
+    Scores `query` against every choice, best first, as `(choice, ratio)` tuples.
+    The query is only prepared once, so this is a lot cheaper than calling `ratio` in a loop.
+    """
+    masks = _masks(query)
+    results = []
+    for choice in choices:
+        total = len(query) + len(choice)
+        score = 2 * _lcs(masks, len(query), choice) / total if total else 1.0
+        if score >= cutoff:
+            results.append((choice, score))
+    if limit is None:
+        return sorted(results, key=lambda result: result[1], reverse=True)
+    return heapq.nlargest(limit, results, key=lambda result: result[1])
@@ -0,0 +1,110 @@
+"""
+Random image URLs fetched ahead of time, so commands don't have to wait on the APIs they come from.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import collections
+import time
+
+import aiohttp
+
+from utils import create_logger
+from utils.cache import Coalescer
+from utils.http import CircuitOpen
+
+logger = create_logger("URLPool")
+
+
+class RateLimiter:
+    """Spaces calls out so there are at most `rate` every `per` seconds."""
+
+    def __init__(self, rate: int, per: float):
+        self.interval = per / rate
+        self._next = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        wait = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class URLPool:
+    """
+    Keeps up to `size` URLs ready for each endpoint of one API.
+    Once an endpoint is down to `low_water` URLs it's refilled in the background,
+    and every request to the API goes through one rate limiter.
+    `fetch(endpoint)` is what actually asks the API, returning a list of URLs.
+    """
+
+    def __init__(self, fetch, *, size: int, low_water: int, rate: int, per: float):
+        self.fetch = fetch
+        self.size = size
+        self.low_water = low_water
+        self.limiter = RateLimiter(rate, per)
+        self.pools = collections.defaultdict(collections.deque)
+        self.hits = 0
+        self.misses = 0
+        self._refilling = Coalescer()
+
+    async def _fetch(self, endpoint: str) -> list:
+        await self.limiter.acquire()
+        return await self.fetch(endpoint)
+
+    async def get(self, endpoint: str):
+        """A random URL from `endpoint`, straight from the pool unless it ran dry."""
+        urls = self.pools[endpoint]
+        if len(urls) <= self.low_water:
+            asyncio.ensure_future(
+                self._refilling.run(endpoint, lambda: self._refill(endpoint))
+            )
+        if urls:
+            self.hits += 1
+            return urls.popleft()
+
+        self.misses += 1
+        batch = await self._fetch(endpoint)
+        if not batch:
+            return None
+        self._add(urls, batch[1:])
+        return batch[0]
+
+    def _add(self, urls, batch):
+        for url in batch:
+            if len(urls) >= self.size:
+                break
+            if url not in urls:
+                urls.append(url)
+
+    async def _refill(self, endpoint: str):
+        urls = self.pools[endpoint]
+        while len(urls) < self.size:
+            before = len(urls)
+            try:
+                self._add(urls, await self._fetch(endpoint))
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                KeyError,
+                CircuitOpen,
+            ) as e:
+                logger.warning("Could not refill %s: %s", endpoint, e)
+                return
+            if len(urls) == before:
+                # the API is only giving back what we already have
+                return
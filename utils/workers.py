@@ -0,0 +1,243 @@
+"""
+Process pool for image work, so rendering doesn't hold up the event loop.
+Copyright (C) 2021 ppotatoo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import collections
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from discord.ext import commands
+
+from utils import create_logger
+
+logger = create_logger("ImagePool")
+
+WORKERS = min(4, os.cpu_count() or 1)
+MAX_QUEUE = 32
+MAX_GUILD_QUEUE = 8
+JOB_TIMEOUT = 60
+
+
+class ImageBusy(commands.CommandError):
+    """Raised when there are already too many images waiting to be made."""
+
+    def __init__(self):
+        super().__init__(
+            "I'm working on too many images right now, please try again in a bit."
+        )
+
+
+class Job:
+    __slots__ = ("name", "func", "args", "future", "queued_at")
+
+    def __init__(self, func, args, future):
+        self.name = func.__name__
+        self.func = func
+        self.args = args
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class ImagePool:
+    """
+    Runs image jobs in worker processes.
+    Waiting jobs are queued per guild, and the guilds take turns, so one busy guild can't starve the rest.
+    Once too many jobs are waiting, new ones are turned away with `ImageBusy`.
+    """
+
+    def __init__(
+        self,
+        workers: int = WORKERS,
+        max_queue: int = MAX_QUEUE,
+        max_guild_queue: int = MAX_GUILD_QUEUE,
+        timeout: float = JOB_TIMEOUT,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_guild_queue = max_guild_queue
+        self.timeout = timeout
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.queues = collections.OrderedDict()
+        self.queued = 0
+        self.running = 0
+        self.rejected = 0
+        self.timings = collections.defaultdict(
+            lambda: {"jobs": 0, "failed": 0, "wait": 0.0, "run": 0.0, "slowest": 0.0}
+        )
+        self.outputs = collections.defaultdict(collections.Counter)
+
+    async def run(self, ctx, func, *args):
+        """
+        Runs `func(*args)` in a worker process and returns what it returned.
+        `func` and its arguments have to be picklable, so module level functions and plain data.
+        """
+        key = ctx.guild.id if ctx.guild else ctx.author.id
+        self._make_room(key, 1)
+        job = self._queue(key, func, args)
+        self._dispatch()
+        # a job that times out while it's still waiting gets skipped
+        return await asyncio.wait_for(job.future, self.timeout)
+
+    async def run_many(self, ctx, func, arguments: list) -> list:
+        """
+        `run` for jobs that are only any use together, like the chunks of an animation.
+        Either there's room for all of them or none are queued, and once one fails the rest are dropped.
+        """
+        key = ctx.guild.id if ctx.guild else ctx.author.id
+        self._make_room(key, len(arguments))
+        futures = [self._queue(key, func, args).future for args in arguments]
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(asyncio.gather(*futures), self.timeout)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _make_room(self, key, jobs: int):
+        queue = self.queues.get(key, ())
+        if (
+            self.queued + jobs > self.max_queue
+            or len(queue) + jobs > self.max_guild_queue
+        ):
+            self.rejected += 1
+            raise ImageBusy()
+
+    def _queue(self, key, func, args) -> Job:
+        job = Job(func, args, asyncio.get_event_loop().create_future())
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = collections.deque()
+        queue.append(job)
+        self.queued += 1
+        return job
+
+    async def render(self, ctx, func, *args):
+        """
+        `run` for jobs that return a `render.Encoded`.
+        Keeps track of what format each command's images are sent as, and how much smaller than PNG they came out.
+        """
+        encoded = await self.run(ctx, func, *args)
+        output = self.outputs[ctx.command.qualified_name]
+        output[encoded.format] += 1
+        output["original"] += encoded.original
+        output["sent"] += len(encoded.data)
+        return encoded
+
+    def _dispatch(self):
+        while self.running < self.workers and self.queues:
+            key, queue = next(iter(self.queues.items()))
+            job = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self.queues.move_to_end(key)
+            else:
+                del self.queues[key]
+            if job.future.done():
+                continue
+
+            executor = self.executor
+            try:
+                future = executor.submit(job.func, *job.args)
+            except BrokenProcessPool:
+                executor = self._restart(executor)
+                future = executor.submit(job.func, *job.args)
+            self.running += 1
+            started = time.perf_counter()
+            future.add_done_callback(
+                functools.partial(self._finished_threadsafe, executor, job, started)
+            )
+
+    def _finished_threadsafe(self, executor, job, started, future):
+        # executor callbacks run in the executor's management thread
+        job.future.get_loop().call_soon_threadsafe(
+            self._finished, executor, job, started, future
+        )
+
+    def _finished(self, executor, job, started, future):
+        self.running -= 1
+        now = time.perf_counter()
+        timing = self.timings[job.name]
+        timing["jobs"] += 1
+        timing["wait"] += started - job.queued_at
+        timing["run"] += now - started
+        timing["slowest"] = max(timing["slowest"], now - started)
+
+        error = future.exception()
+        if error is not None:
+            timing["failed"] += 1
+            if isinstance(error, BrokenProcessPool):
+                self._restart(executor)
+        if not job.future.done():
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(future.result())
+        self._dispatch()
+
+    def _restart(self, broken):
+        """Replaces a pool that lost a worker, unless that already happened."""
+        if self.executor is broken:
+            logger.error("An image worker died, starting a new pool")
+            broken.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> list:
+        """A row per kind of job, for tabulate."""
+        rows = []
+        for name, timing in sorted(self.timings.items()):
+            jobs = timing["jobs"] or 1
+            rows.append(
+                {
+                    "job": name,
+                    "done": timing["jobs"],
+                    "failed": timing["failed"],
+                    "avg wait": f"{timing['wait'] / jobs * 1000:.0f} ms",
+                    "avg run": f"{timing['run'] / jobs * 1000:.0f} ms",
+                    "slowest": f"{timing['slowest'] * 1000:.0f} ms",
+                }
+            )
+        return rows
+
+    def output_stats(self) -> list:
+        """A row per command that has made an image, for tabulate."""
+        rows = []
+        for command, output in sorted(self.outputs.items()):
+            original = output["original"]
+            sent = output["sent"]
+            formats = ", ".join(
+                f"{format} {count}"
+                for format, count in output.most_common()
+                if format not in ("original", "sent")
+            )
+            saved = (original - sent) / original * 100 if original else 0
+            rows.append(
+                {
+                    "command": command,
+                    "formats": formats,
+                    "sent": f"{sent / 1024:.0f} KiB",
+                    "saved": f"{(original - sent) / 1024:.0f} KiB ({saved:.0f}%)",
+                }
+            )
+        return rows